@@ -0,0 +1,33 @@
+"""add reservation expires_at
+
+Revision ID: 11b58dddebd5
+Revises: 2de1a1d3efcc
+Create Date: 2026-10-18 19:14:52.618370
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '11b58dddebd5'
+down_revision: Union[str, None] = '2de1a1d3efcc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing reservations keep a NULL expires_at and are never released as unpaid
+    op.add_column('reservation', sa.Column('expires_at', sa.TIMESTAMP(), nullable=True))
+    op.drop_index('ix_reservation_unpaid_created_at', table_name='reservation')
+    op.create_index('ix_reservation_unpaid_expires_at', 'reservation', ['expires_at'],
+                    postgresql_where=sa.text('status <> 1'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reservation_unpaid_expires_at', table_name='reservation')
+    op.create_index('ix_reservation_unpaid_created_at', 'reservation', ['created_at'],
+                    postgresql_where=sa.text('status <> 1'))
+    op.drop_column('reservation', 'expires_at')
@@ -0,0 +1,28 @@
+"""make review created_at not null
+
+Revision ID: 2de1a1d3efcc
+Revises: e0ad6b4451ea
+Create Date: 2026-10-18 18:06:37.104925
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2de1a1d3efcc'
+down_revision: Union[str, None] = 'e0ad6b4451ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # reviews without a date sort as the oldest ones
+    op.execute("UPDATE review SET created_at = TIMESTAMP '1970-01-01' WHERE created_at IS NULL")
+    op.alter_column('review', 'created_at', existing_type=sa.TIMESTAMP(), nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('review', 'created_at', existing_type=sa.TIMESTAMP(), nullable=True)
@@ -0,0 +1,30 @@
+"""add review feed indexes
+
+Revision ID: 43c7deef92bc
+Revises: 877ef8164956
+Create Date: 2026-10-18 17:20:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '43c7deef92bc'
+down_revision: Union[str, None] = '877ef8164956'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_review_station_id_created_at', 'review', ['station_id', 'created_at', 'id'])
+    op.create_index('ix_review_station_id_rating', 'review', ['station_id', 'rating', 'id'])
+    op.drop_index('ix_review_station_id', table_name='review')
+
+
+def downgrade() -> None:
+    op.create_index('ix_review_station_id', 'review', ['station_id'])
+    op.drop_index('ix_review_station_id_rating', table_name='review')
+    op.drop_index('ix_review_station_id_created_at', table_name='review')
@@ -0,0 +1,49 @@
+"""reservation overlap constraint
+
+Revision ID: 851675c6724a
+Revises: 6bea3f303f1c
+Create Date: 2026-10-18 12:04:31.517204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '851675c6724a'
+down_revision: Union[str, None] = '6bea3f303f1c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OVERLAPS_LIMIT = 20
+
+
+def get_overlapping_reservations() -> list:
+    query = sa.text(
+        "SELECT a.id, b.id, a.station_id FROM reservation a "
+        "JOIN reservation b ON a.station_id = b.station_id AND a.id < b.id "
+        "AND a.start_time < b.end_time AND b.start_time < a.end_time "
+        "ORDER BY a.id, b.id LIMIT :limit"
+    )
+    return op.get_bind().execute(query, {"limit": OVERLAPS_LIMIT}).all()
+
+
+def upgrade() -> None:
+    overlaps = get_overlapping_reservations()
+    if overlaps:
+        pairs = ", ".join(f"{first} and {second} (station {station_id})" for first, second, station_id in overlaps)
+        raise RuntimeError(
+            f"Cannot add reservation_station_time_excl, overlapping reservations exist: {pairs}. "
+            "Delete or move the conflicting reservations and run the migration again"
+        )
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        "ALTER TABLE reservation ADD CONSTRAINT reservation_station_time_excl "
+        "EXCLUDE USING gist (station_id WITH =, tsrange(start_time, end_time, '[)') WITH &&)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('reservation_station_time_excl', 'reservation')
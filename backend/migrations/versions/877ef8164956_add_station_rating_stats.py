@@ -0,0 +1,44 @@
+"""add station rating stats
+
+Revision ID: 877ef8164956
+Revises: e0f1ca404d50
+Create Date: 2026-10-18 16:48:03.915264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '877ef8164956'
+down_revision: Union[str, None] = 'e0f1ca404d50'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('station_rating_stats',
+                    sa.Column('station_id', sa.Integer(), nullable=False),
+                    sa.Column('reviews_count', sa.Integer(), nullable=False),
+                    sa.Column('rating_sum', sa.Integer(), nullable=False),
+                    sa.Column('rating_1', sa.Integer(), nullable=False),
+                    sa.Column('rating_2', sa.Integer(), nullable=False),
+                    sa.Column('rating_3', sa.Integer(), nullable=False),
+                    sa.Column('rating_4', sa.Integer(), nullable=False),
+                    sa.Column('rating_5', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('station_id')
+                    )
+    op.execute(
+        "INSERT INTO station_rating_stats "
+        "SELECT station_id, count(*), sum(rating), "
+        "count(*) FILTER (WHERE rating = 1), count(*) FILTER (WHERE rating = 2), "
+        "count(*) FILTER (WHERE rating = 3), count(*) FILTER (WHERE rating = 4), "
+        "count(*) FILTER (WHERE rating = 5) "
+        "FROM review GROUP BY station_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('station_rating_stats')
@@ -0,0 +1,27 @@
+"""add unpaid reservation index
+
+Revision ID: d265eea59207
+Revises: e7bb9b9fc9b7
+Create Date: 2026-10-18 15:11:42.318206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd265eea59207'
+down_revision: Union[str, None] = 'e7bb9b9fc9b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_reservation_unpaid_created_at', 'reservation', ['created_at'],
+                    postgresql_where=sa.text('status <> 1'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reservation_unpaid_created_at', table_name='reservation')
@@ -0,0 +1,33 @@
+"""add hot path indexes
+
+Revision ID: d43327a98bce
+Revises: 851675c6724a
+Create Date: 2026-10-18 12:41:09.203377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd43327a98bce'
+down_revision: Union[str, None] = '851675c6724a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_reservation_station_id_start_time', 'reservation', ['station_id', 'start_time'],
+                    postgresql_include=['end_time'])
+    op.create_index('ix_reservation_user_id_start_time', 'reservation', ['user_id', 'start_time'])
+    op.create_index('ix_review_station_id', 'review', ['station_id'])
+    op.create_index('ix_payment_reservation', 'payment', ['reservation'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payment_reservation', table_name='payment')
+    op.drop_index('ix_review_station_id', table_name='review')
+    op.drop_index('ix_reservation_user_id_start_time', table_name='reservation')
+    op.drop_index('ix_reservation_station_id_start_time', table_name='reservation')
@@ -0,0 +1,32 @@
+"""add reservation payment id
+
+Revision ID: d528d6519577
+Revises: d43327a98bce
+Create Date: 2026-10-18 13:17:52.664105
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd528d6519577'
+down_revision: Union[str, None] = 'd43327a98bce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reservation', sa.Column('payment_id', sa.String(length=50), nullable=True))
+    op.create_index('ix_reservation_payment_id', 'reservation', ['payment_id'])
+    op.execute(
+        'UPDATE reservation SET payment_id = payment.id '
+        'FROM payment WHERE payment.reservation = reservation.id'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reservation_payment_id', table_name='reservation')
+    op.drop_column('reservation', 'payment_id')
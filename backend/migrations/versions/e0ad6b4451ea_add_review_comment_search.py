@@ -0,0 +1,32 @@
+"""add review comment search
+
+Revision ID: e0ad6b4451ea
+Revises: 43c7deef92bc
+Create Date: 2026-10-18 17:52:11.270483
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e0ad6b4451ea'
+down_revision: Union[str, None] = '43c7deef92bc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('review', sa.Column('comment_tsv', postgresql.TSVECTOR(), sa.Computed(
+        "to_tsvector('russian', coalesce(comment, '')) || to_tsvector('english', coalesce(comment, ''))",
+        persisted=True,
+    ), nullable=True))
+    op.create_index('ix_review_comment_tsv', 'review', ['comment_tsv'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_review_comment_tsv', table_name='review')
+    op.drop_column('review', 'comment_tsv')
@@ -0,0 +1,29 @@
+"""add reservation reminded at
+
+Revision ID: e0f1ca404d50
+Revises: d265eea59207
+Create Date: 2026-10-18 16:05:19.482731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e0f1ca404d50'
+down_revision: Union[str, None] = 'd265eea59207'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reservation', sa.Column('reminded_at', sa.TIMESTAMP(), nullable=True))
+    op.create_index('ix_reservation_unreminded_start_time', 'reservation', ['start_time'],
+                    postgresql_where=sa.text('status = 1 AND reminded_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reservation_unreminded_start_time', table_name='reservation')
+    op.drop_column('reservation', 'reminded_at')
@@ -0,0 +1,26 @@
+"""add reservation start time index
+
+Revision ID: e7bb9b9fc9b7
+Revises: d528d6519577
+Create Date: 2026-10-18 14:02:26.734850
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7bb9b9fc9b7'
+down_revision: Union[str, None] = 'd528d6519577'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_reservation_start_time_id', 'reservation', ['start_time', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reservation_start_time_id', table_name='reservation')
@@ -1,4 +1,6 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from fastapi import Depends, FastAPI
 from src.stations.router import router as station_router
 from fastapi_users import FastAPIUsers
 from src.users.models import User
@@ -7,16 +9,54 @@ from src.users.config import auth_backend, get_user_manager
 from src.users.schemas import UserCreate, UserRead, UserUpdate
 from src.reservations.router import router as reservation_router
 from src.reviews.router import router as review_router
+from src.users.router import router as users_router
+from src.users.passwords import password_pool
+from src.users.utils import current_verified_user, is_admin
+from src.database import engine, read_engine, get_pool_stats
+from src.reservations.payments import close_payment_client
+from src.reservations.webhooks import consume_payment_events
 from fastapi.middleware.cors import CORSMiddleware
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    payment_events_consumer = asyncio.create_task(consume_payment_events())
+    yield
+    payment_events_consumer.cancel()
+    with suppress(asyncio.CancelledError):
+        await payment_events_consumer
+    await close_payment_client()
+    password_pool.close()
+
+
 """
 Main FastAPI app
 and included routers
 """
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(station_router)
 app.include_router(reservation_router)
 app.include_router(review_router)
+app.include_router(users_router)
+
+
+@app.get("/stats/database", tags=["stats"])
+async def get_database_stats(current_user: User = Depends(current_verified_user)) -> dict:
+    """
+    Get connection pool usage of this worker
+    """
+    if not is_admin(current_user):
+        return {
+            "status": "error",
+            "data": "Forbidden",
+        }
+    return {
+        "status": "ok",
+        "data": {
+            "primary": get_pool_stats(engine),
+            "replica": get_pool_stats(read_engine) if read_engine is not engine else None,
+        },
+    }
 
 
 origins = [
@@ -0,0 +1,8 @@
+from redis import asyncio as aioredis
+
+from src.config import REDIS_URL
+
+"""
+Shared async redis client
+"""
+redis_client = aioredis.from_url(REDIS_URL, decode_responses=True)
@@ -8,6 +8,16 @@ DB_PORT = os.environ.get("DB_PORT")
 DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASS = os.environ.get("DB_PASS")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 100))
+DB_READ_HOST = os.environ.get("DB_READ_HOST")
+DB_READ_PORT = os.environ.get("DB_READ_PORT") or DB_PORT
+DB_READ_CACHE_TTL = int(os.environ.get("DB_READ_CACHE_TTL", 30))
+READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS", 10))
 
 JWT_SECRET = os.environ.get("JWT_SECRET")
 
@@ -15,10 +25,45 @@ SMTP_HOST = os.environ.get("SMTP_HOST")
 SMTP_PORT = os.environ.get("SMTP_PORT")
 SMTP_USER = os.environ.get("SMTP_USER")
 SMTP_PASS = os.environ.get("SMTP_PASS")
+SMTP_TIMEOUT = float(os.environ.get("SMTP_TIMEOUT", 30))
+SMTP_MAX_PER_SECOND = float(os.environ.get("SMTP_MAX_PER_SECOND", 5))
+SMTP_BATCH_SIZE = int(os.environ.get("SMTP_BATCH_SIZE", 50))
+SMTP_MAX_RETRIES = int(os.environ.get("SMTP_MAX_RETRIES", 5))
 
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
+REDIS_URL = os.environ.get("REDIS_URL") or CELERY_BROKER_URL or "redis://localhost:6379/0"
 
 USER_MANAGER_SECRET = os.environ.get("USER_MANAGER_SECRET")
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 1024))
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 30))
+USER_CACHE_REDIS = os.environ.get("USER_CACHE_REDIS", "false").lower() == "true"
+USER_CACHE_REDIS_TTL = int(os.environ.get("USER_CACHE_REDIS_TTL", 300))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get("PASSWORD_HASH_QUEUE_SIZE", 64))
 
 PAYMENTS_ACCOUNT = os.environ.get("PAYMENTS_ACCOUNT")
-PAYMENTS_SECRET_KEY = os.environ.get("PAYMENTS_SECRET_KEY")
\ No newline at end of file
+PAYMENTS_SECRET_KEY = os.environ.get("PAYMENTS_SECRET_KEY")
+PAYMENTS_PROVIDER = os.environ.get("PAYMENTS_PROVIDER", "http")
+PAYMENTS_API_URL = os.environ.get("PAYMENTS_API_URL", "https://api.yookassa.ru/v3")
+PAYMENTS_TIMEOUT = float(os.environ.get("PAYMENTS_TIMEOUT", 10))
+PAYMENTS_MAX_CONNECTIONS = int(os.environ.get("PAYMENTS_MAX_CONNECTIONS", 20))
+PAYMENTS_FAKE_LATENCY = float(os.environ.get("PAYMENTS_FAKE_LATENCY", 0.1))
+PAYMENTS_FAKE_FAILURE_RATE = float(os.environ.get("PAYMENTS_FAKE_FAILURE_RATE", 0))
+PAYMENTS_FAKE_WEBHOOK_DELAY = float(os.environ.get("PAYMENTS_FAKE_WEBHOOK_DELAY", 1))
+PAYMENTS_FAKE_WEBHOOK_STATUS = os.environ.get("PAYMENTS_FAKE_WEBHOOK_STATUS", "succeeded")
+PAYMENTS_WEBHOOK_BATCH_SIZE = int(os.environ.get("PAYMENTS_WEBHOOK_BATCH_SIZE", 500))
+PAYMENTS_WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("PAYMENTS_WEBHOOK_MAX_ATTEMPTS", 10))
+PAYMENTS_WEBHOOK_IPS = [ip for ip in os.environ.get("PAYMENTS_WEBHOOK_IPS", "").split(",") if ip]
+PAYMENTS_TRUSTED_PROXIES = [ip for ip in os.environ.get("PAYMENTS_TRUSTED_PROXIES", "").split(",") if ip]
+PAYMENTS_WEBHOOKS_ENABLED = bool(PAYMENTS_WEBHOOK_IPS) or PAYMENTS_PROVIDER == "fake"
+
+CLUB_OPEN_HOUR = int(os.environ.get("CLUB_OPEN_HOUR", 9))
+CLUB_CLOSE_HOUR = int(os.environ.get("CLUB_CLOSE_HOUR", 22))
+SLOT_MINUTES = int(os.environ.get("SLOT_MINUTES", 60))
+AVAILABILITY_CACHE_TTL = int(os.environ.get("AVAILABILITY_CACHE_TTL", 600))
+SLOT_HOLD_MINUTES = int(os.environ.get("SLOT_HOLD_MINUTES", 10))
+UNPAID_RESERVATION_MINUTES = int(os.environ.get("UNPAID_RESERVATION_MINUTES", 30))
+EXPIRED_RESERVATIONS_BATCH_SIZE = int(os.environ.get("EXPIRED_RESERVATIONS_BATCH_SIZE", 200))
+EXPIRED_RESERVATIONS_INTERVAL = int(os.environ.get("EXPIRED_RESERVATIONS_INTERVAL", 60))
+REMINDER_LEAD_MINUTES = int(os.environ.get("REMINDER_LEAD_MINUTES", 60))
+REMINDER_INTERVAL = int(os.environ.get("REMINDER_INTERVAL", 300))
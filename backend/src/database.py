@@ -1,15 +1,137 @@
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import time
+from typing import AsyncGenerator, Dict, Type, Union
+from fastapi import Request, Response
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from src.config import DB_USER, DB_PORT, DB_PASS, DB_NAME, DB_HOST
+from src.config import (DB_USER, DB_PORT, DB_PASS, DB_NAME, DB_HOST, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                        DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_STATEMENT_CACHE_SIZE, DB_READ_HOST, DB_READ_PORT,
+                        READ_YOUR_WRITES_SECONDS)
 
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+READ_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_READ_HOST}:{DB_READ_PORT}/{DB_NAME}"
+
+READ_PRIMARY_COOKIE = "read_primary"
+
+
+def validate_pool_settings() -> None:
+    """
+    Fails startup on pool settings the engine would reject or silently misuse
+    """
+    if DB_POOL_SIZE < 1:
+        raise ValueError("DB_POOL_SIZE must be at least 1")
+    if DB_MAX_OVERFLOW < -1:
+        raise ValueError("DB_MAX_OVERFLOW must be -1 (unlimited) or more")
+    if DB_POOL_TIMEOUT <= 0:
+        raise ValueError("DB_POOL_TIMEOUT must be positive")
+    if DB_POOL_RECYCLE < -1:
+        raise ValueError("DB_POOL_RECYCLE must be -1 (never) or more")
+    if DB_STATEMENT_CACHE_SIZE < 0:
+        raise ValueError("DB_STATEMENT_CACHE_SIZE must not be negative")
+
+
+class PoolStats:
+    """
+    Connection acquisition counters shared by the pool and its recreated instances
+    """
+
+    def __init__(self):
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float) -> None:
+        self.acquired += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+class MonitoredPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool recording how long connections are waited for and how often the wait times out
+    """
+    stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+class MonitoredReadPool(MonitoredPool):
+    stats = PoolStats()
+
+
+def create_pooled_engine(url: str, poolclass: Type[MonitoredPool]) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        poolclass=poolclass,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_args={
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+validate_pool_settings()
 
 base = declarative_base()
-engine = create_async_engine(DATABASE_URL)
+engine = create_pooled_engine(DATABASE_URL, MonitoredPool)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+if DB_READ_HOST:
+    read_engine = create_pooled_engine(READ_DATABASE_URL, MonitoredReadPool)
+    read_session_maker = async_sessionmaker(read_engine, expire_on_commit=False, info={"replica": True})
+else:
+    read_engine = engine
+    read_session_maker = async_session_maker
+
+
+def get_pool_stats(pool_engine: AsyncEngine = engine) -> Dict[str, Union[int, float]]:
+    pool = pool_engine.pool
+    stats = pool.stats
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "acquired": stats.acquired,
+        "timeouts": stats.timeouts,
+        "wait_avg_ms": round(stats.wait_total / stats.acquired * 1000, 3) if stats.acquired else 0,
+        "wait_max_ms": round(stats.wait_max * 1000, 3),
+    }
+
+
+def is_replica_session(session: AsyncSession) -> bool:
+    return session.info.get("replica", False)
+
+
+def is_read_your_writes_session(session: AsyncSession) -> bool:
+    return session.info.get("read_your_writes", False)
+
+
+def read_from_primary(response: Response) -> None:
+    """
+    Routes reads of the client to the primary for a while after it wrote,
+    so it does not miss its own writes on a lagging replica
+    """
+    if read_engine is not engine:
+        response.set_cookie(READ_PRIMARY_COOKIE, "1", max_age=READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax")
+
 
 async def get_async_session(
 ) -> AsyncGenerator[AsyncSession, None]:
@@ -18,3 +140,16 @@ async def get_async_session(
     """
     async with async_session_maker() as session:
         yield session
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Get a new async session for read-only endpoints, served by the replica when one is configured.
+    Clients that just wrote read the primary and bypass shared caches
+    """
+    read_your_writes = bool(request.cookies.get(READ_PRIMARY_COOKIE))
+    session_maker = async_session_maker if read_your_writes else read_session_maker
+    async with session_maker() as session:
+        if read_your_writes:
+            session.info["read_your_writes"] = True
+        yield session
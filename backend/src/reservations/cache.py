@@ -0,0 +1,187 @@
+import json
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import redis_client
+from src.config import AVAILABILITY_CACHE_TTL, DB_READ_CACHE_TTL
+from src.database import is_read_your_writes_session, is_replica_session
+from src.reservations.slots import iter_days, load_occupancy_range
+from src.stations.models import station
+
+"""
+Redis cache of occupied slot masks keyed by station and day,
+invalidated by every reservation write.
+Invalidation also bumps a generation counter of the station-day,
+a reader stores the mask it loaded only if the generation it saw before loading is unchanged,
+so a fill racing with a write never caches the pre-write mask
+"""
+
+logger = logging.getLogger(__name__)
+
+STATIONS_KEY = "availability:stations"
+HITS_KEY = "availability:hits"
+MISSES_KEY = "availability:misses"
+
+FILL_SCRIPT = """
+local written = 0
+for i = 1, #KEYS, 2 do
+    if (redis.call('GET', KEYS[i + 1]) or '') == ARGV[i + 1] then
+        redis.call('SET', KEYS[i], ARGV[i + 2], 'EX', ARGV[1])
+        written = written + 1
+    end
+end
+return written
+"""
+
+fill_script = redis_client.register_script(FILL_SCRIPT)
+
+
+def get_cache_ttl(session: AsyncSession) -> int:
+    """
+    Entries loaded from a replica may miss the latest writes, so they live shorter
+    """
+    return DB_READ_CACHE_TTL if is_replica_session(session) else AVAILABILITY_CACHE_TTL
+
+
+def occupancy_key(station_id: int, day: date) -> str:
+    return f"availability:occupancy:{station_id}:{day.isoformat()}"
+
+
+def generation_key(station_id: int, day: date) -> str:
+    return f"availability:generation:{station_id}:{day.isoformat()}"
+
+
+async def get_working_stations(session: AsyncSession) -> Dict[int, str]:
+    """
+    Returns types of working stations by station ID
+    """
+    cached = await redis_client.get(STATIONS_KEY)
+    if cached is not None:
+        return {int(station_id): station_type for station_id, station_type in json.loads(cached).items()}
+    query = select(station.c.id, station.c.type).where(station.c.is_working.is_not(False))
+    result = await session.execute(query)
+    stations = dict(result.all())
+    await redis_client.set(STATIONS_KEY, json.dumps(stations), ex=get_cache_ttl(session))
+    return stations
+
+
+async def get_cached_occupancy(first_day: date, last_day: date, session: AsyncSession,
+                               station_ids: Optional[List[int]] = None,
+                               station_types: Optional[List[str]] = None) -> Dict[int, Dict[date, int]]:
+    stations = await get_working_stations(session)
+    if station_ids:
+        stations = {k: v for k, v in stations.items() if k in station_ids}
+    if station_types:
+        types = {t.lower() for t in station_types}
+        stations = {k: v for k, v in stations.items() if v.lower() in types}
+
+    days = iter_days(first_day, last_day)
+    keys = [(station_id, day) for station_id in stations for day in days]
+    values, generations = [], []
+    if keys:
+        cached = await redis_client.mget(
+            [occupancy_key(*key) for key in keys] + [generation_key(*key) for key in keys]
+        )
+        values, generations = cached[:len(keys)], cached[len(keys):]
+
+    occupancy = {station_id: {} for station_id in stations}
+    missing_station_ids, missing_days = set(), set()
+    seen_generations = {}
+    for key, value, generation in zip(keys, values, generations):
+        station_id, day = key
+        if value is None:
+            missing_station_ids.add(station_id)
+            missing_days.add(day)
+            seen_generations[key] = generation or ""
+        else:
+            occupancy[station_id][day] = int(value)
+
+    if missing_days:
+        loaded = await load_occupancy_range(min(missing_days), max(missing_days), session,
+                                            sorted(missing_station_ids))
+        fill_keys, fill_args = [], [get_cache_ttl(session)]
+        for station_id, loaded_days in loaded.items():
+            for day, mask in loaded_days.items():
+                occupancy[station_id][day] = mask
+                if (station_id, day) in seen_generations:
+                    fill_keys += [occupancy_key(station_id, day), generation_key(station_id, day)]
+                    fill_args += [seen_generations[(station_id, day)], mask]
+        if fill_keys:
+            await fill_script(keys=fill_keys, args=fill_args)
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        misses = len(seen_generations)
+        pipe.incrby(HITS_KEY, len(values) - misses)
+        pipe.incrby(MISSES_KEY, misses)
+        await pipe.execute()
+
+    return {
+        station_id: {day: station_days[day] for day in days}
+        for station_id, station_days in occupancy.items()
+        if len(station_days) == len(days)
+    }
+
+
+async def get_occupancy(first_day: date, last_day: date, session: AsyncSession,
+                        station_ids: Optional[List[int]] = None,
+                        station_types: Optional[List[str]] = None) -> Dict[int, Dict[date, int]]:
+    """
+    Returns occupied slot masks of working stations for every day in [first_day, last_day],
+    served from redis when possible and from the database otherwise.
+    Clients that just wrote always read the database, the cache may hold a mask filled from a lagging replica
+    """
+    if is_read_your_writes_session(session):
+        return await load_occupancy_range(first_day, last_day, session, station_ids, station_types)
+    try:
+        return await get_cached_occupancy(first_day, last_day, session, station_ids, station_types)
+    except RedisError as e:
+        logger.warning("Availability cache is unavailable: %s", e)
+        return await load_occupancy_range(first_day, last_day, session, station_ids, station_types)
+
+
+async def invalidate_occupancy(*slots: Tuple[int, datetime, datetime]) -> None:
+    """
+    Drops cached masks of every station-day touched by the given (station_id, start_time, end_time)
+    and bumps their generations, so fills that started before the write are not stored
+    """
+    keys = {
+        (station_id, day)
+        for station_id, start_time, end_time in slots
+        for day in iter_days(start_time.date(), end_time.date())
+    }
+    if not keys:
+        return
+    try:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for key in keys:
+                pipe.incr(generation_key(*key))
+                pipe.expire(generation_key(*key), AVAILABILITY_CACHE_TTL)
+            pipe.delete(*(occupancy_key(*key) for key in keys))
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("Availability cache invalidation failed, entries expire in %s s: %s",
+                       AVAILABILITY_CACHE_TTL, e)
+
+
+async def invalidate_stations() -> None:
+    """
+    Drops the cached list of working stations
+    """
+    try:
+        await redis_client.delete(STATIONS_KEY)
+    except RedisError as e:
+        logger.warning("Availability cache invalidation failed, entries expire in %s s: %s",
+                       AVAILABILITY_CACHE_TTL, e)
+
+
+async def get_cache_stats() -> Dict[str, int]:
+    hits, misses = await redis_client.mget(HITS_KEY, MISSES_KEY)
+    return {
+        "hits": int(hits or 0),
+        "misses": int(misses or 0),
+    }
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import AsyncGenerator, Dict, Optional, Set, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import redis_client
+from src.reservations.cache import get_occupancy
+from src.reservations.holds import apply_holds
+from src.reservations.slots import day_bounds, free_mask, iter_days, mask_to_slots
+
+"""
+Availability change events.
+Writers publish the new free slots of every touched station-day to redis,
+every worker keeps one pattern subscription and fans events out to its clients
+"""
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "availability:events:"
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+RECONNECT_DELAY_SECONDS = 1
+RECONNECT_DELAY_MAX_SECONDS = 30
+
+
+def get_channel(day: date) -> str:
+    return f"{CHANNEL_PREFIX}{day.isoformat()}"
+
+
+async def publish_availability(session: AsyncSession, *slots: Tuple[int, datetime, datetime]) -> None:
+    """
+    Publishes free slots of every station-day touched by the given (station_id, start_time, end_time)
+    """
+    touched = {
+        (station_id, day)
+        for station_id, start_time, end_time in slots
+        for day in iter_days(start_time.date(), end_time.date())
+    }
+    if not touched:
+        return
+    days = [day for _, day in touched]
+    try:
+        occupancy = await apply_holds(await get_occupancy(min(days), max(days), session,
+                                                          sorted({station_id for station_id, _ in touched})))
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for station_id, day in sorted(touched):
+                if station_id not in occupancy:
+                    continue
+                event = {
+                    "station_id": station_id,
+                    "date": day.isoformat(),
+                    "free_slots": mask_to_slots(free_mask(occupancy[station_id][day]), day_bounds(day)[0]),
+                }
+                pipe.publish(get_channel(day), json.dumps(event))
+            await pipe.execute()
+    except (RedisError, SQLAlchemyError) as e:
+        logger.warning("Availability events were not published: %s", e)
+
+
+class AvailabilityBroadcaster:
+    """
+    Fans availability events of a single redis subscription out to local subscribers
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self.listener: Optional[asyncio.Task] = None
+        self.delay = RECONNECT_DELAY_SECONDS
+
+    async def receive(self) -> None:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+            self.delay = RECONNECT_DELAY_SECONDS
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                day = message["channel"][len(CHANNEL_PREFIX):]
+                for queue in self.subscribers.get(day, ()):
+                    if not queue.full():
+                        queue.put_nowait(message["data"])
+        finally:
+            await pubsub.aclose()
+
+    async def listen(self) -> None:
+        """
+        Keeps the subscription alive, resubscribing with exponential backoff after redis errors
+        """
+        self.delay = RECONNECT_DELAY_SECONDS
+        while True:
+            try:
+                await self.receive()
+            except RedisError as e:
+                logger.warning("Availability events subscription was lost, reconnecting in %s s: %s",
+                               self.delay, e)
+            await asyncio.sleep(self.delay)
+            self.delay = min(self.delay * 2, RECONNECT_DELAY_MAX_SECONDS)
+
+    @asynccontextmanager
+    async def subscribe(self, day: date) -> AsyncGenerator[asyncio.Queue, None]:
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self.listen())
+        key = day.isoformat()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers[key].add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers[key].discard(queue)
+            if not self.subscribers[key]:
+                del self.subscribers[key]
+
+
+broadcaster = AvailabilityBroadcaster()
+
+
+async def stream_availability_events(day: date, station_id: Optional[int]) -> AsyncGenerator[str, None]:
+    """
+    Yields availability events for the day as server-sent events
+    """
+    async with broadcaster.subscribe(day) as queue:
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if station_id is not None and json.loads(data)["station_id"] != station_id:
+                continue
+            yield f"data: {data}\n\n"
@@ -0,0 +1,150 @@
+import logging
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from src.cache import redis_client
+from src.config import SLOT_HOLD_MINUTES
+from src.reservations.slots import day_bounds, occupancy_mask
+
+"""
+Short-lived slot holds taken during checkout.
+Holds of a station-day are kept in one redis sorted set,
+members are "<slot index>:<user id>" scored by expiry time in ms
+"""
+
+logger = logging.getLogger(__name__)
+
+HOLD_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+local wanted = {}
+for i = 4, #ARGV do
+    wanted[ARGV[i]] = true
+end
+for _, member in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+    local slot, owner = string.match(member, '^(%d+):(.+)$')
+    if wanted[slot] and owner ~= ARGV[1] then
+        return 0
+    end
+end
+for i = 4, #ARGV do
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[i] .. ':' .. ARGV[1])
+end
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+redis.call('PEXPIREAT', KEYS[1], last[2])
+return 1
+"""
+
+hold_script = redis_client.register_script(HOLD_SCRIPT)
+
+
+def holds_key(station_id: int, day: date) -> str:
+    return f"holds:{station_id}:{day.isoformat()}"
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def mask_to_indexes(mask: int) -> List[int]:
+    return [index for index in range(mask.bit_length()) if mask >> index & 1]
+
+
+def get_hold_mask(station_id: int, start_time: datetime, end_time: datetime) -> int:
+    day_start, _ = day_bounds(start_time.date())
+    return occupancy_mask(start_time, end_time, day_start)
+
+
+async def acquire_hold(station_id: int, start_time: datetime, end_time: datetime,
+                       user_id: int) -> Optional[datetime]:
+    """
+    Holds the slots for the user, returns expiry time
+    or None if another user already holds any of them
+    """
+    indexes = mask_to_indexes(get_hold_mask(station_id, start_time, end_time))
+    if not indexes:
+        return None
+    expires_at = now_ms() + SLOT_HOLD_MINUTES * 60 * 1000
+    acquired = await hold_script(
+        keys=[holds_key(station_id, start_time.date())],
+        args=[user_id, now_ms(), expires_at, *indexes],
+    )
+    if not acquired:
+        return None
+    return datetime.fromtimestamp(expires_at / 1000)
+
+
+async def release_hold(station_id: int, start_time: datetime, end_time: datetime, user_id: int) -> None:
+    indexes = mask_to_indexes(get_hold_mask(station_id, start_time, end_time))
+    if indexes:
+        await redis_client.zrem(holds_key(station_id, start_time.date()),
+                                *[f"{index}:{user_id}" for index in indexes])
+
+
+async def get_held_masks(station_days: List[Tuple[int, date]],
+                         exclude_user_id: Optional[int] = None) -> Dict[Tuple[int, date], int]:
+    """
+    Returns masks of slots held by active holds for the given (station_id, day) pairs
+    """
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for station_id, day in station_days:
+            pipe.zrangebyscore(holds_key(station_id, day), now_ms(), "+inf")
+        results = await pipe.execute()
+
+    held = {}
+    for station_day, members in zip(station_days, results):
+        mask = 0
+        for member in members:
+            index, owner = member.split(":", 1)
+            if exclude_user_id is None or owner != str(exclude_user_id):
+                mask |= 1 << int(index)
+        held[station_day] = mask
+    return held
+
+
+async def is_time_slot_held(user_id: Optional[int], *slots: Tuple[int, datetime, datetime]) -> bool:
+    """
+    Checks if any of the given (station_id, start_time, end_time) is held by another user,
+    holds are ignored when redis is unavailable
+    """
+    try:
+        held = await get_held_masks([(station_id, start_time.date()) for station_id, start_time, _ in slots],
+                                    exclude_user_id=user_id)
+    except RedisError as e:
+        logger.warning("Slot holds are unavailable: %s", e)
+        return False
+    return any(
+        held[(station_id, start_time.date())] & get_hold_mask(station_id, start_time, end_time)
+        for station_id, start_time, end_time in slots
+    )
+
+
+async def release_holds(user_id: int, *slots: Tuple[int, datetime, datetime]) -> None:
+    """
+    Releases holds of the user after the slots got booked
+    """
+    try:
+        for station_id, start_time, end_time in slots:
+            await release_hold(station_id, start_time, end_time, user_id)
+    except RedisError as e:
+        logger.warning("Slot holds were not released, they expire in %s min: %s", SLOT_HOLD_MINUTES, e)
+
+
+async def apply_holds(occupancy: Dict[int, Dict[date, int]]) -> Dict[int, Dict[date, int]]:
+    """
+    Marks held slots as occupied, holds are ignored when redis is unavailable
+    """
+    station_days = [(station_id, day) for station_id, days in occupancy.items() for day in days]
+    if not station_days:
+        return occupancy
+    try:
+        held = await get_held_masks(station_days)
+    except RedisError as e:
+        logger.warning("Slot holds are unavailable: %s", e)
+        return occupancy
+    return {
+        station_id: {day: mask | held[(station_id, day)] for day, mask in days.items()}
+        for station_id, days in occupancy.items()
+    }
@@ -1,10 +1,17 @@
 from datetime import datetime
-from sqlalchemy import MetaData, Integer, TIMESTAMP, ForeignKey, Table, Column, Identity, String, REAL
+from sqlalchemy import MetaData, Integer, TIMESTAMP, ForeignKey, Table, Column, Identity, String, REAL, text, Index
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from src.users.models import user
 
 
 metadata = MetaData()
 
+RESERVATION_OVERLAP_CONSTRAINT = 'reservation_station_time_excl'
+
+RESERVATION_STATUS_PENDING = 0
+RESERVATION_STATUS_PAID = 1
+RESERVATION_STATUS_CANCELED = 2
+
 reservation = Table(
     'reservation',
     metadata,
@@ -18,6 +25,23 @@ reservation = Table(
     Column('start_time', TIMESTAMP, nullable=False),
     Column('end_time', TIMESTAMP, nullable=False),
     Column('created_at', TIMESTAMP, default=datetime.utcnow),
+    Column('payment_id', String(50), nullable=True),
+    Column('reminded_at', TIMESTAMP, nullable=True),
+    Column('expires_at', TIMESTAMP, nullable=True),
+    ExcludeConstraint(
+        ('station_id', '='),
+        (text("tsrange(start_time, end_time, '[)')"), '&&'),
+        name=RESERVATION_OVERLAP_CONSTRAINT,
+        using='gist',
+    ),
+    Index('ix_reservation_station_id_start_time', 'station_id', 'start_time', postgresql_include=['end_time']),
+    Index('ix_reservation_user_id_start_time', 'user_id', 'start_time'),
+    Index('ix_reservation_payment_id', 'payment_id'),
+    Index('ix_reservation_start_time_id', 'start_time', 'id'),
+    Index('ix_reservation_unpaid_expires_at', 'expires_at',
+          postgresql_where=text(f'status <> {RESERVATION_STATUS_PAID}')),
+    Index('ix_reservation_unreminded_start_time', 'start_time',
+          postgresql_where=text(f'status = {RESERVATION_STATUS_PAID} AND reminded_at IS NULL')),
 )
 
 
@@ -31,4 +55,5 @@ payment = Table(
     Column("by_user", Integer, ForeignKey(user.c.id), nullable=False),
     Column("reservation", Integer, ForeignKey(reservation.c.id), nullable=False),
     Column("created_at", TIMESTAMP, nullable=False),
+    Index('ix_payment_reservation', 'reservation'),
 )
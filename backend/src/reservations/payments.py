@@ -1,53 +1,281 @@
+import asyncio
 import json
+from abc import ABC, abstractmethod
+import random
 import uuid
 from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Union
 
-from sqlalchemy import insert
+import httpx
+from sqlalchemy import delete, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from yookassa import Payment, Configuration
+from yookassa.domain.exceptions import NotFoundError
 
-from src.config import PAYMENTS_SECRET_KEY, PAYMENTS_ACCOUNT
-from src.reservations.models import payment
+from src.cache import redis_client
+from src.config import (PAYMENTS_SECRET_KEY, PAYMENTS_ACCOUNT, PAYMENTS_PROVIDER, PAYMENTS_API_URL,
+                        PAYMENTS_TIMEOUT, PAYMENTS_MAX_CONNECTIONS, PAYMENTS_FAKE_LATENCY,
+                        PAYMENTS_FAKE_FAILURE_RATE, PAYMENTS_FAKE_WEBHOOK_DELAY, PAYMENTS_FAKE_WEBHOOK_STATUS)
+from src.reservations.models import payment, reservation
 
 Configuration.account_id = PAYMENTS_ACCOUNT
 Configuration.secret_key = PAYMENTS_SECRET_KEY
 
 
+class PaymentProviderError(Exception):
+    pass
+
+
+class PaymentNotFoundError(PaymentProviderError):
+    pass
+
+
+class PaymentClient(ABC):
+    """
+    Interface of a payment provider client, payments are returned as provider JSON dicts
+    """
+
+    @abstractmethod
+    async def create_payment(self, payment_request: dict, idempotency_key: str) -> dict:
+        ...
+
+    @abstractmethod
+    async def get_payment(self, payment_id: str) -> dict:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class YooKassaHttpClient(PaymentClient):
+    """
+    Calls the YooKassa REST API through a pooled keep-alive HTTP session
+    """
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            base_url=PAYMENTS_API_URL,
+            auth=(PAYMENTS_ACCOUNT or "", PAYMENTS_SECRET_KEY or ""),
+            timeout=PAYMENTS_TIMEOUT,
+            limits=httpx.Limits(max_connections=PAYMENTS_MAX_CONNECTIONS,
+                                max_keepalive_connections=PAYMENTS_MAX_CONNECTIONS),
+        )
+
+    async def create_payment(self, payment_request: dict, idempotency_key: str) -> dict:
+        response = await self.client.post("/payments", json=payment_request,
+                                          headers={"Idempotence-Key": idempotency_key})
+        response.raise_for_status()
+        return response.json()
+
+    async def get_payment(self, payment_id: str) -> dict:
+        response = await self.client.get(f"/payments/{payment_id}")
+        if response.status_code == 404:
+            raise PaymentNotFoundError(f"Payment {payment_id} not found")
+        response.raise_for_status()
+        return response.json()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class YooKassaSdkClient(PaymentClient):
+    """
+    Runs the synchronous YooKassa SDK in a worker thread
+    """
+
+    async def create_payment(self, payment_request: dict, idempotency_key: str) -> dict:
+        new_payment = await asyncio.wait_for(
+            asyncio.to_thread(Payment.create, payment_request, idempotency_key),
+            PAYMENTS_TIMEOUT,
+        )
+        return json.loads(new_payment.json())
+
+    async def get_payment(self, payment_id: str) -> dict:
+        try:
+            found_payment = await asyncio.wait_for(asyncio.to_thread(Payment.find_one, payment_id), PAYMENTS_TIMEOUT)
+        except NotFoundError:
+            raise PaymentNotFoundError(f"Payment {payment_id} not found")
+        return json.loads(found_payment.json())
+
+
+FAKE_PAYMENT_TTL = 24 * 3600
+
+
+def fake_payment_key(payment_id: str) -> str:
+    return f"payments:fake:{payment_id}"
+
+
+class FakePaymentClient(PaymentClient):
+    """
+    Provider for load and integration tests with configurable latency,
+    failure rate and webhook callbacks, webhooks are enqueued like real notifications.
+    Payments are kept in redis, so every worker sees the payments created by the others
+    """
+
+    def __init__(self):
+        self.callbacks: Set[asyncio.Task] = set()
+
+    async def simulate_call(self) -> None:
+        await asyncio.sleep(PAYMENTS_FAKE_LATENCY)
+        if random.random() < PAYMENTS_FAKE_FAILURE_RATE:
+            raise PaymentProviderError("Fake payment provider failure")
+
+    async def load_payment(self, payment_id: str) -> dict:
+        stored = await redis_client.get(fake_payment_key(payment_id))
+        if stored is None:
+            raise PaymentNotFoundError(f"Payment {payment_id} not found")
+        return json.loads(stored)
+
+    async def send_webhook(self, payment_id: str) -> None:
+        # webhooks import this module to confirm statuses
+        from src.reservations.webhooks import enqueue_payment_event
+
+        await asyncio.sleep(PAYMENTS_FAKE_WEBHOOK_DELAY)
+        fake_payment = await self.load_payment(payment_id)
+        fake_payment["status"] = PAYMENTS_FAKE_WEBHOOK_STATUS
+        await redis_client.set(fake_payment_key(payment_id), json.dumps(fake_payment), ex=FAKE_PAYMENT_TTL)
+        await enqueue_payment_event(fake_payment)
+
+    async def create_payment(self, payment_request: dict, idempotency_key: str) -> dict:
+        await self.simulate_call()
+        payment_id = str(uuid.uuid5(uuid.NAMESPACE_OID, idempotency_key))
+        new_payment = {
+            "id": payment_id,
+            "status": "pending",
+            "amount": payment_request["amount"],
+            "created_at": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+            "confirmation": {
+                "type": "redirect",
+                "confirmation_url": f"https://fake-payments.local/checkout/{payment_id}",
+            },
+        }
+        # a repeated idempotency key returns the stored payment like the real provider
+        if not await redis_client.set(fake_payment_key(payment_id), json.dumps(new_payment),
+                                      ex=FAKE_PAYMENT_TTL, nx=True):
+            return await self.load_payment(payment_id)
+        if PAYMENTS_FAKE_WEBHOOK_DELAY >= 0:
+            callback = asyncio.create_task(self.send_webhook(payment_id))
+            self.callbacks.add(callback)
+            callback.add_done_callback(self.callbacks.discard)
+        return new_payment
+
+    async def get_payment(self, payment_id: str) -> dict:
+        await self.simulate_call()
+        return await self.load_payment(payment_id)
+
+    async def close(self) -> None:
+        for callback in self.callbacks:
+            callback.cancel()
+
+
+PAYMENT_CLIENTS = {
+    "http": YooKassaHttpClient,
+    "sdk": YooKassaSdkClient,
+    "fake": FakePaymentClient,
+}
+
+payment_client: Optional[PaymentClient] = None
+
+
+def get_payment_client() -> PaymentClient:
+    global payment_client
+    if payment_client is None:
+        payment_client = PAYMENT_CLIENTS[PAYMENTS_PROVIDER]()
+    return payment_client
+
+
+async def close_payment_client() -> None:
+    global payment_client
+    if payment_client is not None:
+        await payment_client.close()
+        payment_client = None
+
+
+async def fetch_payments(payment_ids: Iterable[str]) -> Dict[str, Union[dict, Exception]]:
+    """
+    Fetches payments from the provider, at most PAYMENTS_MAX_CONNECTIONS at a time,
+    failed lookups are returned as their exceptions
+    """
+    client = get_payment_client()
+    semaphore = asyncio.Semaphore(PAYMENTS_MAX_CONNECTIONS)
+
+    async def fetch(payment_id: str) -> dict:
+        async with semaphore:
+            return await client.get_payment(payment_id)
+
+    payment_ids = list(payment_ids)
+    results = await asyncio.gather(*(fetch(payment_id) for payment_id in payment_ids), return_exceptions=True)
+    return dict(zip(payment_ids, results))
+
+
 def get_timestamp(dt: str):
     return datetime.fromisoformat(dt[:-1])
 
 async def add_payment(
         payment_dict: dict,
         user_id: int,
-        reservation_id: int,
+        reservation_ids: List[int],
         session: AsyncSession
 ):
+    """
+    Saves the payment and links it to every reservation it pays for
+    """
     new_payment = {
         "id": payment_dict["id"],
         "status": payment_dict["status"],
         "currency": payment_dict['amount']["currency"],
         "amount": float(payment_dict['amount']["value"]),
         "by_user": user_id,
-        "reservation": reservation_id,
+        "reservation": reservation_ids[0],
         "created_at": get_timestamp(payment_dict["created_at"]),
     }
     stmt = insert(payment).values(new_payment)
     await session.execute(stmt)
+    stmt = (
+        update(reservation)
+        .where(reservation.c.id.in_(reservation_ids))
+        .values(payment_id=new_payment["id"])
+    )
+    await session.execute(stmt)
     await session.commit()
 
 
+async def release_payments(reservation_ids: List[int], session: AsyncSession) -> None:
+    """
+    Unlinks payments from reservations about to be deleted,
+    a payment shared with a remaining reservation is moved to it, other payments are deleted
+    """
+    linked_payments = select(reservation.c.payment_id).where(reservation.c.id.in_(reservation_ids))
+    await session.execute(select(payment.c.id).where(payment.c.id.in_(linked_payments)).with_for_update())
+    remaining_reservation = (
+        select(func.min(reservation.c.id))
+        .where(reservation.c.payment_id == payment.c.id, reservation.c.id.not_in(reservation_ids))
+        .scalar_subquery()
+    )
+    stmt = (
+        update(payment)
+        .where(payment.c.reservation.in_(reservation_ids), remaining_reservation.is_not(None))
+        .values(reservation=remaining_reservation)
+    )
+    await session.execute(stmt)
+    await session.execute(delete(payment).where(payment.c.reservation.in_(reservation_ids)))
+
+
 async def get_payment_data(payment_id: str):
-    return json.loads(Payment.find_one(payment_id).json())
+    return await get_payment_client().get_payment(payment_id)
 
 
 async def create_payment(
         amount: float,
         user_id: int,
-        reservation_id: int,
+        reservation_ids: List[int],
         session: AsyncSession
 ):
-    idempotency_key = uuid.uuid4()
-    new_payment = Payment.create({
+    """
+    Creates a single payment for the given reservations
+    and returns the confirmation url
+    """
+    new_payment_data = await get_payment_client().create_payment({
         "amount": {
             "value": str(amount),
             "currency": "RUB",
@@ -58,8 +286,7 @@ async def create_payment(
         },
         "capture": True,
     },
-        idempotency_key=idempotency_key,
+        idempotency_key=str(uuid.uuid4()),
     )
-    new_payment_data = await get_payment_data(new_payment.id)
-    await add_payment(new_payment_data, user_id, reservation_id, session)
-    return new_payment.confirmation.confirmation_url
+    await add_payment(new_payment_data, user_id, reservation_ids, session)
+    return new_payment_data["confirmation"]["confirmation_url"]
@@ -1,14 +1,26 @@
-from datetime import datetime, timedelta, time
-from typing import List, Dict, Set
-
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, insert, update, delete, and_
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple, AsyncGenerator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, insert, update, delete, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_async_session
-from src.reservations.models import reservation, payment
-from src.reservations.payments import create_payment
-from src.reservations.schemas import ReservationCreate, ReservationUpdate
+from src.config import UNPAID_RESERVATION_MINUTES
+from src.database import get_async_session, get_read_session, async_session_maker, read_from_primary
+from src.reservations.models import reservation, RESERVATION_STATUS_PENDING
+from src.reservations.payments import create_payment, release_payments
+from src.reservations.schemas import (ReservationCreate, ReservationUpdate, ReservationBatchCreate, ReservationHold,
+                                     PaymentNotification)
+from src.reservations.cache import get_occupancy, get_cache_stats, invalidate_occupancy
+from src.reservations.events import publish_availability, stream_availability_events
+from src.reservations.holds import acquire_hold, apply_holds, is_time_slot_held, release_hold, release_holds
+from src.reservations.slots import day_bounds, free_mask, mask_to_slots, occupancy_mask
+from src.reservations.webhooks import enqueue_payment_event, get_sender_address, is_trusted_sender
 from src.stations.models import station
 from src.users.models import user
 from src.users.utils import current_verified_user, is_admin, is_staff
@@ -17,6 +29,14 @@ router = APIRouter(
     tags=["reservations"],
 )
 
+MAX_MATRIX_DAYS = 31
+RESERVATION_AMOUNT = 100
+RESERVATION_DURATION = timedelta(hours=1)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 1000
+EXCLUSION_VIOLATION = "23P01"
+
 
 async def does_station_exist(station_id: int, session: AsyncSession) -> bool:
     """
@@ -27,37 +47,116 @@ async def does_station_exist(station_id: int, session: AsyncSession) -> bool:
     return bool(result.mappings().all())
 
 
-async def is_time_slot_available(station_id: int, start_time: datetime, end_time: datetime,
-                                 session: AsyncSession) -> bool:
+def is_time_slot_conflict(error: IntegrityError) -> bool:
     """
-    Checks if the given time slot is available for the station
+    Checks if the error is a violation of the reservation overlap constraint
     """
-    query = select(reservation).where(
-        and_(
-            reservation.c.station_id == station_id,
-            reservation.c.start_time < end_time,
-            reservation.c.end_time > start_time
-        )
-    )
-    result = await session.execute(query)
-    return not result.mappings().all()
+    return getattr(error.orig, "pgcode", None) == EXCLUSION_VIOLATION
+
+
+async def execute_reservation_write(stmt, session: AsyncSession):
+    """
+    Executes and commits a reservation write, the overlap constraint
+    in the database rejects writes to taken time slots
+    """
+    try:
+        result = await session.execute(stmt)
+        await session.commit()
+    except IntegrityError as e:
+        await session.rollback()
+        if is_time_slot_conflict(e):
+            raise HTTPException(status_code=400, detail="Time slot is not available")
+        raise
+    return result
+
+
+def encode_cursor(start_time: datetime, reservation_id: int) -> str:
+    return urlsafe_b64encode(f"{start_time.isoformat()}|{reservation_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        start_time, reservation_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(start_time), int(reservation_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def get_reservations_query(date_from: Optional[str], date_to: Optional[str],
+                           station_id: Optional[int], status: Optional[int]):
+    """
+    Builds a reservation listing query ordered by (start_time, id)
+    """
+    query = select(reservation).order_by(reservation.c.start_time, reservation.c.id)
+    if date_from is not None:
+        query = query.where(reservation.c.start_time >= get_date_object(date_from))
+    if date_to is not None:
+        query = query.where(reservation.c.start_time < get_date_object(date_to) + timedelta(days=1))
+    if station_id is not None:
+        query = query.where(reservation.c.station_id == station_id)
+    if status is not None:
+        query = query.where(reservation.c.status == status)
+    return query
+
+
+async def stream_reservations(query) -> AsyncGenerator[str, None]:
+    """
+    Yields reservations as NDJSON lines from a server-side cursor
+    """
+    async with async_session_maker() as session:
+        result = await session.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for row in result.mappings():
+            yield json.dumps(jsonable_encoder(dict(row))) + "\n"
 
 
 @router.get("/")
-async def get_all_reservations(session: AsyncSession = Depends(get_async_session),
-                               current_user: user = Depends(current_verified_user)) -> dict:
+async def get_all_reservations(
+        cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+        date_from: Optional[str] = Query(None, description="Дата в формате YYYY-MM-DD"),
+        date_to: Optional[str] = Query(None, description="Дата в формате YYYY-MM-DD"),
+        station_id: Optional[int] = None,
+        status: Optional[int] = None,
+        stream: bool = Query(False, description="Выгрузить все записи в формате NDJSON"),
+        session: AsyncSession = Depends(get_async_session),
+        current_user: user = Depends(current_verified_user)) -> dict:
     """
-    Get all reservations
+    Get all reservations, page by page when cursor or limit is passed, or stream them as NDJSON
     """
     try:
-        if await is_admin(current_user.id, session) or await is_staff(current_user.id, session):
-            query = select(reservation)
-            result = await session.execute(query)
+        if is_admin(current_user) or is_staff(current_user):
+            query = get_reservations_query(date_from, date_to, station_id, status)
+            if cursor is not None:
+                query = query.where(
+                    tuple_(reservation.c.start_time, reservation.c.id) > tuple_(*decode_cursor(cursor))
+                )
+            if stream:
+                return StreamingResponse(stream_reservations(query), media_type="application/x-ndjson")
+            if cursor is None and limit is None:
+                result = await session.execute(query)
+                return {
+                    "status": "ok",
+                    "data": [dict(row) for row in result.mappings().all()],
+                    "next_cursor": None,
+                }
+
+            limit = limit or DEFAULT_PAGE_SIZE
+            result = await session.execute(query.limit(limit + 1))
             data = [dict(row) for row in result.mappings().all()]
+            next_cursor = None
+            if len(data) > limit:
+                data = data[:limit]
+                next_cursor = encode_cursor(data[-1]["start_time"], data[-1]["id"])
             return {
                 "status": "ok",
                 "data": data,
+                "next_cursor": next_cursor,
             }
+    except HTTPException as e:
+        return {
+            "status": "error",
+            "data": str(e.detail),
+        }
     except Exception as e:
         return {
             "status": "error",
@@ -65,13 +164,13 @@ async def get_all_reservations(session: AsyncSession = Depends(get_async_session
         }
 
 @router.get("/my")
-async def get_my_reservations(session: AsyncSession = Depends(get_async_session),
+async def get_my_reservations(session: AsyncSession = Depends(get_read_session),
                                current_user: user = Depends(current_verified_user)) -> dict:
     """
     Get my reservations
     """
     try:
-        if await is_admin(current_user.id, session) or await is_staff(current_user.id, session):
+        if is_admin(current_user) or is_staff(current_user):
             query = select(reservation).where(reservation.c.user_id == current_user.id)
             result = await session.execute(query)
             data = [dict(row) for row in result.mappings().all()]
@@ -90,60 +189,123 @@ def get_date_object(date_str: str) -> datetime:
     return datetime.strptime(date_str, '%Y-%m-%d')
 
 
-def generate_all_slots(start_time: datetime, end_time: datetime) -> List[str]:
-    all_slots = []
-    current_time = start_time
-    while current_time <= end_time:
-        all_slots.append(current_time.time().strftime('%H:%M'))
-        current_time += timedelta(hours=1)
-    return all_slots
-
-
-def get_occupied_slots(reservations: List[Dict[str, datetime]]) -> Set[str]:
-    occupied_slots = set()
-    for res in reservations:
-        start = res['start_time'].strftime('%H:%M')
-        end = res['end_time'].strftime('%H:%M')
-        current_time = datetime.combine(res['date'], time(0, 0))
-        end_time = datetime.combine(res['date'], time(23, 59, 59))
-        while current_time <= end_time:
-            if start <= current_time.time().strftime('%H:%M') < end:
-                occupied_slots.add(current_time.time().strftime('%H:%M'))
-            current_time += timedelta(hours=1)
-    return occupied_slots
-
-
-async def get_available_slots(date: str, session: AsyncSession) -> List[str]:
-    date_obj = get_date_object(date)
-    start_time = datetime.combine(date_obj, time(9, 0))
-    end_time = datetime.combine(date_obj, time(21, 59, 59))
-
-    query = (
-        select(reservation)
-        .where(reservation.c.date == date_obj)
-        .order_by(reservation.c.start_time)
-    )
-    result = await session.execute(query)
-    reservations = [dict(row) for row in result.mappings().all()]
-
-    all_slots = generate_all_slots(start_time, end_time)
-    occupied_slots = get_occupied_slots(reservations)
-    available_slots = [slot for slot in all_slots if slot not in occupied_slots]
-
-    return available_slots
+async def get_available_slots(date: str, session: AsyncSession,
+                              station_id: Optional[int] = None) -> Dict[int, List[str]]:
+    """
+    Get free slots of every working station (or of the given one) for the date
+    """
+    date_obj = get_date_object(date).date()
+    day_start, _ = day_bounds(date_obj)
+    occupancy = await apply_holds(await get_occupancy(date_obj, date_obj, session,
+                                                      [station_id] if station_id is not None else None))
+    return {
+        occupied_station_id: mask_to_slots(free_mask(days[date_obj]), day_start)
+        for occupied_station_id, days in occupancy.items()
+    }
 
 
 @router.get("/availability/")
 async def get_availability(
         date: str = Query(..., description="Дата в формате YYYY-MM-DD"),
-        session: AsyncSession = Depends(get_async_session),
+        station_id: Optional[int] = Query(None, description="ID станции"),
+        session: AsyncSession = Depends(get_read_session),
 ) -> dict:
     try:
-        available_slots = await get_available_slots(date, session)
+        available_slots = await get_available_slots(date, session, station_id)
+        if station_id is not None:
+            if station_id not in available_slots:
+                raise HTTPException(status_code=404, detail="Station not found")
+            available_slots = available_slots[station_id]
         return {
             "status": "ok",
             "data": available_slots
         }
+    except HTTPException as e:
+        return {
+            "status": "error",
+            "data": str(e.detail)
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "data": str(e)
+        }
+
+
+@router.get("/availability/events")
+async def get_availability_events(
+        date: str = Query(..., description="Дата в формате YYYY-MM-DD"),
+        station_id: Optional[int] = Query(None, description="ID станции"),
+):
+    """
+    Subscribe to free slot changes for the date as server-sent events
+    """
+    try:
+        return StreamingResponse(
+            stream_availability_events(get_date_object(date).date(), station_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except Exception as e:
+        return {
+            "status": "error",
+            "data": str(e)
+        }
+
+
+@router.get("/availability/cache")
+async def get_availability_cache_stats() -> dict:
+    """
+    Get hit and miss counters of the availability cache
+    """
+    try:
+        return {
+            "status": "ok",
+            "data": await get_cache_stats()
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "data": str(e)
+        }
+
+
+@router.get("/availability/matrix")
+async def get_availability_matrix(
+        date_from: str = Query(..., description="Первый день в формате YYYY-MM-DD"),
+        date_to: str = Query(..., description="Последний день в формате YYYY-MM-DD"),
+        station_id: Optional[List[int]] = Query(None, description="ID станций"),
+        station_type: Optional[List[str]] = Query(None, description="Типы станций"),
+        session: AsyncSession = Depends(get_read_session),
+) -> dict:
+    """
+    Get free slots of every station for every day in the date range
+    """
+    try:
+        first_day = get_date_object(date_from).date()
+        last_day = get_date_object(date_to).date()
+        if last_day < first_day:
+            raise HTTPException(status_code=400, detail="date_to must not be earlier than date_from")
+        if (last_day - first_day).days >= MAX_MATRIX_DAYS:
+            raise HTTPException(status_code=400, detail=f"Date range must not exceed {MAX_MATRIX_DAYS} days")
+
+        occupancy = await apply_holds(await get_occupancy(first_day, last_day, session, station_id, station_type))
+        data = {
+            occupied_station_id: {
+                day.isoformat(): mask_to_slots(free_mask(occupied), day_bounds(day)[0])
+                for day, occupied in days.items()
+            }
+            for occupied_station_id, days in occupancy.items()
+        }
+        return {
+            "status": "ok",
+            "data": data
+        }
+    except HTTPException as e:
+        return {
+            "status": "error",
+            "data": str(e.detail)
+        }
     except Exception as e:
         return {
             "status": "error",
@@ -151,34 +313,59 @@ async def get_availability(
         }
 
 
+async def on_reservations_changed(session: AsyncSession, *slots: Tuple[int, datetime, datetime]) -> None:
+    """
+    Drops cached availability of the touched station-days and notifies subscribers
+    """
+    await invalidate_occupancy(*slots)
+    await publish_availability(session, *slots)
+
+
+def get_reservation_slot(reservation_dict: dict) -> Tuple[int, datetime, datetime]:
+    return reservation_dict["station_id"], reservation_dict["start_time"], reservation_dict["end_time"]
+
+
+def get_reservation_dict(new_reservation: ReservationCreate, user_id: int) -> dict:
+    """
+    Builds a pending reservation row for the given user, only payments move it to other statuses
+    """
+    new_reservation_dict = new_reservation.dict()
+    new_reservation_dict["status"] = RESERVATION_STATUS_PENDING
+    new_reservation_dict["amount"] = RESERVATION_AMOUNT
+    new_reservation_dict["user_id"] = user_id
+    new_reservation_dict["staff_id"] = user_id
+    new_reservation_dict["end_time"] = new_reservation_dict["start_time"] + RESERVATION_DURATION
+    new_reservation_dict["created_at"] = datetime.utcnow()
+    new_reservation_dict["expires_at"] = new_reservation_dict["created_at"] + timedelta(
+        minutes=UNPAID_RESERVATION_MINUTES)
+    return new_reservation_dict
+
+
 @router.post("/")
 async def create_reservation(new_reservation: ReservationCreate,
+                             response: Response,
                              current_user: user  = Depends(current_verified_user),
                              session: AsyncSession = Depends(get_async_session)) -> dict:
     """
     Create a new reservation
     """
     try:
-        new_reservation_dict = new_reservation.dict()
-        new_reservation_dict["amount"] = 100
-        new_reservation_dict["user_id"]  =  current_user.id
-        new_reservation_dict["staff_id"] = current_user.id
-        new_reservation_dict["end_time"] = new_reservation_dict["start_time"] + timedelta(hours=1)
-        new_reservation_dict["created_at"] = datetime.utcnow()
+        new_reservation_dict = get_reservation_dict(new_reservation, current_user.id)
         if not await does_station_exist(new_reservation_dict["station_id"], session):
             raise HTTPException(status_code=400, detail="Station with this ID does not exist")
-        if not await is_time_slot_available(new_reservation_dict["station_id"], new_reservation_dict["start_time"],
-                                            new_reservation_dict["end_time"], session):
-            raise HTTPException(status_code=400, detail="Time slot is not available")
+        if await is_time_slot_held(current_user.id, get_reservation_slot(new_reservation_dict)):
+            raise HTTPException(status_code=400, detail="Time slot is held by another user")
         stmt = insert(reservation).values(new_reservation_dict)
-        inserted_data = await session.execute(stmt)
-        await session.commit()
+        inserted_data = await execute_reservation_write(stmt, session)
+        read_from_primary(response)
+        await release_holds(current_user.id, get_reservation_slot(new_reservation_dict))
+        await on_reservations_changed(session, get_reservation_slot(new_reservation_dict))
 
         payment_url = ""
         if new_reservation_dict["amount"]  > 0:
             payment_url = await create_payment(new_reservation_dict["amount"],
                                  new_reservation_dict["user_id"],
-                                inserted_data.inserted_primary_key[0],
+                                [inserted_data.inserted_primary_key[0]],
                                                session)
 
         return {
@@ -195,8 +382,142 @@ async def create_reservation(new_reservation: ReservationCreate,
         }
 
 
+@router.post("/batch")
+async def create_reservations_batch(new_reservations: ReservationBatchCreate,
+                                    response: Response,
+                                    current_user: user = Depends(current_verified_user),
+                                    session: AsyncSession = Depends(get_async_session)) -> dict:
+    """
+    Create several reservations at once with a single payment,
+    either all of them are created or none
+    """
+    try:
+        new_reservation_dicts = [
+            get_reservation_dict(new_reservation, current_user.id)
+            for new_reservation in new_reservations.reservations
+        ]
+        station_ids = {new_reservation_dict["station_id"] for new_reservation_dict in new_reservation_dicts}
+        query = select(station.c.id).where(station.c.id.in_(station_ids))
+        result = await session.execute(query)
+        if set(result.scalars().all()) != station_ids:
+            raise HTTPException(status_code=400, detail="Station with this ID does not exist")
+        slots = [get_reservation_slot(new_reservation_dict) for new_reservation_dict in new_reservation_dicts]
+        if await is_time_slot_held(current_user.id, *slots):
+            raise HTTPException(status_code=400, detail="Time slot is held by another user")
+
+        stmt = insert(reservation).values(new_reservation_dicts).returning(reservation.c.id)
+        inserted_data = await execute_reservation_write(stmt, session)
+        reservation_ids = list(inserted_data.scalars().all())
+        read_from_primary(response)
+        await release_holds(current_user.id, *slots)
+        await on_reservations_changed(session, *slots)
+
+        amount = sum(new_reservation_dict["amount"] for new_reservation_dict in new_reservation_dicts)
+        payment_url = ""
+        if amount > 0:
+            payment_url = await create_payment(amount, current_user.id, reservation_ids, session)
+
+        for reservation_id, new_reservation_dict in zip(reservation_ids, new_reservation_dicts):
+            new_reservation_dict["id"] = reservation_id
+        return {
+            "status": "ok",
+            "data": {
+                "inserted_data": new_reservation_dicts,
+                "payment_url": payment_url
+            },
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "data": str(e),
+        }
+
+
+@router.post("/holds")
+async def hold_time_slot(new_hold: ReservationHold,
+                         current_user: user = Depends(current_verified_user),
+                         session: AsyncSession = Depends(get_async_session)) -> dict:
+    """
+    Hold a time slot for the current user while the reservation is being paid
+    """
+    try:
+        start_time = new_hold.start_time
+        end_time = start_time + timedelta(hours=1)
+        day = start_time.date()
+        occupancy = await get_occupancy(day, day, session, [new_hold.station_id])
+        if new_hold.station_id not in occupancy:
+            raise HTTPException(status_code=400, detail="Station with this ID does not exist")
+        day_start, _ = day_bounds(day)
+        if occupancy[new_hold.station_id][day] & occupancy_mask(start_time, end_time, day_start):
+            raise HTTPException(status_code=400, detail="Time slot is not available")
+        expires_at = await acquire_hold(new_hold.station_id, start_time, end_time, current_user.id)
+        if expires_at is None:
+            raise HTTPException(status_code=400, detail="Time slot is held by another user")
+        await publish_availability(session, (new_hold.station_id, start_time, end_time))
+        return {
+            "status": "ok",
+            "data": {
+                "station_id": new_hold.station_id,
+                "start_time": start_time,
+                "end_time": end_time,
+                "expires_at": expires_at,
+            },
+        }
+    except HTTPException as e:
+        return {
+            "status": "error",
+            "data": str(e.detail),
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "data": str(e),
+        }
+
+
+@router.delete("/holds")
+async def release_time_slot(station_id: int, start_time: datetime,
+                            current_user: user = Depends(current_verified_user),
+                            session: AsyncSession = Depends(get_async_session)) -> dict:
+    """
+    Release a time slot held by the current user
+    """
+    try:
+        end_time = start_time + timedelta(hours=1)
+        await release_hold(station_id, start_time, end_time, current_user.id)
+        await publish_availability(session, (station_id, start_time, end_time))
+        return {
+            "status": "ok",
+            "data": None,
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "data": str(e),
+        }
+
+
+@router.post("/payments/webhook")
+async def payment_webhook(notification: PaymentNotification, request: Request) -> dict:
+    """
+    Accept a payment provider notification, statuses are applied in background batches
+    """
+    if not is_trusted_sender(get_sender_address(request)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if "id" not in notification.object or "status" not in notification.object:
+        raise HTTPException(status_code=400, detail="Invalid notification")
+    try:
+        await enqueue_payment_event(notification.object)
+        return {
+            "status": "ok",
+            "data": None,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{reservation_id}")
-async def get_reservation(reservation_id: int, session: AsyncSession = Depends(get_async_session)) -> dict:
+async def get_reservation(reservation_id: int, session: AsyncSession = Depends(get_read_session)) -> dict:
     """
     Get a reservation by ID
     """
@@ -218,7 +539,7 @@ async def get_reservation(reservation_id: int, session: AsyncSession = Depends(g
 
 
 @router.patch("/{reservation_id}")
-async def update_reservation(reservation_id: int, updated_reservation: ReservationUpdate,
+async def update_reservation(reservation_id: int, updated_reservation: ReservationUpdate, response: Response,
                              session: AsyncSession = Depends(get_async_session)) -> dict:
     """
     Update a reservation by ID
@@ -228,16 +549,21 @@ async def update_reservation(reservation_id: int, updated_reservation: Reservati
         update_data = updated_reservation.dict(exclude_unset=True)
         if "station_id" in update_data and not await does_station_exist(update_data["station_id"], session):
             raise HTTPException(status_code=400, detail="Station with this ID does not exist")
-        if not await is_time_slot_available(update_data.get("station_id", existing_reservation["data"]["station_id"]),
-                                            update_data.get("start_time", existing_reservation["data"]["start_time"]),
-                                            update_data.get("end_time", existing_reservation["data"]["end_time"]),
-                                            session):
-            raise HTTPException(status_code=400, detail="Time slot is not available")
 
         updated_data = {**existing_reservation["data"], **update_data}
-        stmt = update(reservation).where(reservation.c.id == reservation_id).values(**updated_data)
-        await session.execute(stmt)
-        await session.commit()
+        if "start_time" in update_data:
+            updated_data["end_time"] = updated_data["start_time"] + RESERVATION_DURATION
+        if await is_time_slot_held(None, get_reservation_slot(updated_data)):
+            raise HTTPException(status_code=400, detail="Time slot is held by another user")
+        stmt = (
+            update(reservation)
+            .where(reservation.c.id == reservation_id)
+            .values(**{k: v for k, v in updated_data.items() if k != "id"})
+        )
+        await execute_reservation_write(stmt, session)
+        read_from_primary(response)
+        await on_reservations_changed(session, get_reservation_slot(existing_reservation["data"]),
+                                      get_reservation_slot(updated_data))
         return {
             "status": "ok",
             "data": updated_data,
@@ -255,17 +581,22 @@ async def update_reservation(reservation_id: int, updated_reservation: Reservati
 
 
 @router.delete("/{reservation_id}")
-async def delete_reservation(reservation_id: int, session: AsyncSession = Depends(get_async_session)) -> dict:
+async def delete_reservation(reservation_id: int, response: Response,
+                             session: AsyncSession = Depends(get_async_session)) -> dict:
     """
     Delete a reservation by ID
     """
     try:
-        stmt = delete(payment).where(payment.c.reservation == reservation_id)
-        await session.execute(stmt)
-        await session.commit()
-        stmt = delete(reservation).where(reservation.c.id == reservation_id)
-        await session.execute(stmt)
+        await release_payments([reservation_id], session)
+        stmt = (
+            delete(reservation)
+            .where(reservation.c.id == reservation_id)
+            .returning(reservation.c.station_id, reservation.c.start_time, reservation.c.end_time)
+        )
+        result = await session.execute(stmt)
         await session.commit()
+        read_from_primary(response)
+        await on_reservations_changed(session, *result.all())
         return {
             "status": "ok",
             "data": None,
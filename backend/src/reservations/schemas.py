@@ -1,16 +1,29 @@
-from typing import Optional
-from pydantic import BaseModel
+from typing import Optional, List
+from pydantic import BaseModel, Field
 from datetime import date as d, datetime as dt
 
 class ReservationCreate(BaseModel):
     station_id: int
-    status: int = 0
     date: d = d.today()
     start_time: dt = dt.now()
 
 
 class ReservationUpdate(BaseModel):
     station_id: Optional[int] = None
-    status: int = 0
     date: Optional[d] = d.today()
     start_time: Optional[dt] = dt.now()
+
+
+class ReservationBatchCreate(BaseModel):
+    reservations: List[ReservationCreate] = Field(..., min_length=1, max_length=24)
+
+
+class ReservationHold(BaseModel):
+    station_id: int
+    start_time: dt
+
+
+class PaymentNotification(BaseModel):
+    type: str
+    event: str
+    object: dict
@@ -0,0 +1,130 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import CLUB_OPEN_HOUR, CLUB_CLOSE_HOUR, SLOT_MINUTES
+from src.reservations.models import reservation
+from src.stations.models import station
+
+"""
+Slot occupancy engine.
+Every station-day is an int bitmask: bit i is set when
+the slot starting at opening time + i * SLOT_MINUTES is taken
+"""
+
+if (CLUB_CLOSE_HOUR - CLUB_OPEN_HOUR) * 60 % SLOT_MINUTES:
+    raise ValueError("SLOT_MINUTES must divide the club working day")
+
+SLOT_STEP = timedelta(minutes=SLOT_MINUTES)
+SLOTS_PER_DAY = (CLUB_CLOSE_HOUR - CLUB_OPEN_HOUR) * 60 // SLOT_MINUTES
+FULL_MASK = (1 << SLOTS_PER_DAY) - 1
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """
+    Returns opening and closing datetime of the club for the given day
+    """
+    return (
+        datetime.combine(day, time(CLUB_OPEN_HOUR)),
+        datetime.combine(day, time(0)) + timedelta(hours=CLUB_CLOSE_HOUR),
+    )
+
+
+def occupancy_mask(start_time: datetime, end_time: datetime, day_start: datetime) -> int:
+    """
+    Returns the mask of slots overlapped by [start_time, end_time)
+    """
+    first = max(0, (start_time - day_start) // SLOT_STEP)
+    last = min(SLOTS_PER_DAY, -((day_start - end_time) // SLOT_STEP))
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def free_mask(occupied: int) -> int:
+    return FULL_MASK & ~occupied
+
+
+def mask_to_slots(mask: int, day_start: datetime) -> List[str]:
+    """
+    Converts a slot mask to a list of slot start times in HH:MM format
+    """
+    slots = []
+    while mask:
+        low_bit = mask & -mask
+        index = low_bit.bit_length() - 1
+        slots.append((day_start + index * SLOT_STEP).strftime('%H:%M'))
+        mask ^= low_bit
+    return slots
+
+
+def next_free_slot(occupied: int, day_start: datetime, after: datetime) -> Optional[str]:
+    """
+    Returns the start time in HH:MM format of the first free slot starting not earlier than after
+    """
+    first = max(0, -((day_start - after) // SLOT_STEP))
+    mask = free_mask(occupied) >> first << first
+    if not mask:
+        return None
+    return mask_to_slots(mask & -mask, day_start)[0]
+
+
+def iter_days(first_day: date, last_day: date) -> List[date]:
+    return [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+
+
+def get_reservation_range():
+    """
+    Matches the expression of the reservation overlap constraint, so its GiST index serves range lookups
+    """
+    return func.tsrange(reservation.c.start_time, reservation.c.end_time, literal_column("'[)'"))
+
+
+def get_occupancy_query(range_start: datetime, range_end: datetime,
+                        station_ids: Optional[List[int]] = None,
+                        station_types: Optional[List[str]] = None):
+    """
+    Selects working stations with their reservations overlapping [range_start, range_end)
+    """
+    query = (
+        select(station.c.id, reservation.c.start_time, reservation.c.end_time)
+        .select_from(station)
+        .outerjoin(reservation, (reservation.c.station_id == station.c.id) & get_reservation_range().op("&&")(
+            func.tsrange(range_start, range_end, literal_column("'[)'"))
+        ))
+        .where(station.c.is_working.is_not(False))
+    )
+    if station_ids:
+        query = query.where(station.c.id.in_(station_ids))
+    if station_types:
+        query = query.where(func.lower(station.c.type).in_([t.lower() for t in station_types]))
+    return query
+
+
+async def load_occupancy_range(first_day: date, last_day: date, session: AsyncSession,
+                               station_ids: Optional[List[int]] = None,
+                               station_types: Optional[List[str]] = None) -> Dict[int, Dict[date, int]]:
+    """
+    Returns occupied slot masks of working stations for every day in [first_day, last_day],
+    built from a single query over overlapping reservations
+    """
+    range_start, _ = day_bounds(first_day)
+    _, range_end = day_bounds(last_day)
+    days = iter_days(first_day, last_day)
+    query = get_occupancy_query(range_start, range_end, station_ids, station_types)
+    result = await session.execute(query)
+
+    occupancy = {}
+    for row_station_id, start_time, end_time in result.all():
+        if row_station_id not in occupancy:
+            occupancy[row_station_id] = dict.fromkeys(days, 0)
+        if start_time is None:
+            continue
+        station_days = occupancy[row_station_id]
+        for day in iter_days(max(start_time.date(), first_day), min(end_time.date(), last_day)):
+            day_start, _ = day_bounds(day)
+            station_days[day] |= occupancy_mask(start_time, end_time, day_start)
+    return occupancy
+
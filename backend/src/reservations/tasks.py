@@ -0,0 +1,206 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, List, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy import delete, exists, or_, and_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import EXPIRED_RESERVATIONS_BATCH_SIZE, REMINDER_LEAD_MINUTES
+from src.database import async_session_maker
+from src.reservations.cache import invalidate_occupancy
+from src.reservations.events import publish_availability
+from src.reservations.models import (payment, reservation, RESERVATION_STATUS_PENDING, RESERVATION_STATUS_PAID,
+                                     RESERVATION_STATUS_CANCELED)
+from src.reservations.payments import PaymentNotFoundError, fetch_payments, release_payments
+from src.reservations.webhooks import apply_payment_statuses
+from src.stations.models import station
+from src.users.manager import celery_app, enqueue_emails
+from src.users.models import user
+
+"""
+Periodic reservation jobs run by celery beat.
+Tasks run their async bodies on one event loop per worker process,
+so the database engine and redis client are shared between runs
+"""
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SETTLING_PAYMENT_STATUSES = ["waiting_for_capture", "succeeded"]
+
+event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def run_async(coroutine: Awaitable[T]) -> T:
+    """
+    Runs the coroutine on the event loop of the current worker process
+    """
+    global event_loop
+    if event_loop is None or event_loop.is_closed():
+        event_loop = asyncio.new_event_loop()
+    return event_loop.run_until_complete(coroutine)
+
+
+def get_expired_filter(now: datetime):
+    settling_payment = exists().where(
+        payment.c.id == reservation.c.payment_id,
+        payment.c.status.in_(SETTLING_PAYMENT_STATUSES),
+    )
+    return and_(
+        reservation.c.status != RESERVATION_STATUS_PAID,
+        or_(
+            reservation.c.status == RESERVATION_STATUS_CANCELED,
+            and_(reservation.c.status == RESERVATION_STATUS_PENDING, reservation.c.expires_at < now),
+        ),
+        ~settling_payment,
+    )
+
+
+async def get_unsettled_payments(payment_ids: Set[str]) -> Set[str]:
+    """
+    Asks the provider about payments of expired reservations and applies settled statuses,
+    returns payments known to be unpaid, payments that could not be checked are kept for the next run
+    """
+    unsettled, settled = set(), {}
+    for payment_id, result in (await fetch_payments(payment_ids)).items():
+        if isinstance(result, PaymentNotFoundError):
+            unsettled.add(payment_id)
+        elif isinstance(result, Exception):
+            logger.info("Payment %s was not checked, keeping its reservations: %s", payment_id, result)
+        elif result.get("status") in SETTLING_PAYMENT_STATUSES:
+            settled[payment_id] = result["status"]
+        else:
+            unsettled.add(payment_id)
+    await apply_payment_statuses(settled)
+    return unsettled
+
+
+async def release_expired_batch(now: datetime, after_id: int,
+                                session: AsyncSession) -> Tuple[Optional[int], List[Tuple[int, datetime, datetime]]]:
+    """
+    Deletes a batch of canceled reservations and pending ones past expires_at,
+    returns the last examined ID and the released slots.
+    Payments of pending reservations are confirmed with the provider first, outside of row locks,
+    rows locked by concurrent writers are skipped until the next run
+    """
+    query = (
+        select(reservation.c.id, reservation.c.status, reservation.c.payment_id)
+        .where(get_expired_filter(now), reservation.c.id > after_id)
+        .order_by(reservation.c.id)
+        .limit(EXPIRED_RESERVATIONS_BATCH_SIZE)
+    )
+    candidates = (await session.execute(query)).all()
+    await session.commit()
+    if not candidates:
+        return None, []
+    payment_ids = {
+        row.payment_id for row in candidates
+        if row.status == RESERVATION_STATUS_PENDING and row.payment_id is not None
+    }
+    unsettled = await get_unsettled_payments(payment_ids) if payment_ids else set()
+    ids = [
+        row.id for row in candidates
+        if row.status != RESERVATION_STATUS_PENDING or row.payment_id is None or row.payment_id in unsettled
+    ]
+
+    query = (
+        select(reservation.c.id, reservation.c.station_id, reservation.c.start_time, reservation.c.end_time)
+        .where(reservation.c.id.in_(ids), get_expired_filter(now))
+        .with_for_update(of=reservation, skip_locked=True)
+    )
+    rows = (await session.execute(query)).all() if ids else []
+    if rows:
+        released_ids = [row.id for row in rows]
+        await release_payments(released_ids, session)
+        await session.execute(delete(reservation).where(reservation.c.id.in_(released_ids)))
+    await session.commit()
+    return candidates[-1].id, [(row.station_id, row.start_time, row.end_time) for row in rows]
+
+
+async def release_expired() -> int:
+    """
+    Releases expired reservations batch by batch and refreshes availability of their slots
+    """
+    now = datetime.utcnow()
+    released, after_id = 0, 0
+    async with async_session_maker() as session:
+        while after_id is not None:
+            after_id, slots = await release_expired_batch(now, after_id, session)
+            if slots:
+                await invalidate_occupancy(*slots)
+                await publish_availability(session, *slots)
+                await session.commit()
+            released += len(slots)
+    return released
+
+
+@celery_app.task
+def release_expired_reservations() -> int:
+    """
+    Releases slots of reservations that were not paid in time
+    """
+    released = run_async(release_expired())
+    if released:
+        logger.info("Released %s expired reservations", released)
+    return released
+
+
+def get_reminder_message(email: str, username: str, bookings: List[Tuple[str, datetime]]) -> dict:
+    """
+    Returns one reminder message listing all upcoming bookings of the user
+    """
+    lines = "".join(
+        f'<li>{station_name}, {start_time.strftime("%d.%m.%Y %H:%M")}</li>'
+        for station_name, start_time in sorted(bookings, key=lambda booking: booking[1])
+    )
+    return {
+        "user_email": email,
+        "subject": "Напоминание о бронировании",
+        "content": f'<div>{username}, скоро начнется ваше бронирование:<ul>{lines}</ul></div>',
+    }
+
+
+async def send_reminders() -> int:
+    """
+    Marks paid reservations starting within REMINDER_LEAD_MINUTES as reminded and enqueues their emails,
+    marking and selecting is a single UPDATE so every reservation is reminded once
+    """
+    now = datetime.now()
+    stmt = (
+        update(reservation)
+        .where(
+            reservation.c.user_id == user.c.id,
+            reservation.c.station_id == station.c.id,
+            reservation.c.status == RESERVATION_STATUS_PAID,
+            reservation.c.reminded_at.is_(None),
+            reservation.c.start_time > now,
+            reservation.c.start_time <= now + timedelta(minutes=REMINDER_LEAD_MINUTES),
+        )
+        .values(reminded_at=now)
+        .returning(user.c.email, user.c.username, station.c.name, reservation.c.start_time)
+    )
+    async with async_session_maker() as session:
+        rows = (await session.execute(stmt)).all()
+        bookings = defaultdict(list)
+        for email, username, station_name, start_time in rows:
+            bookings[(email, username)].append((station_name, start_time))
+        enqueue_emails([
+            get_reminder_message(email, username, user_bookings)
+            for (email, username), user_bookings in bookings.items()
+        ])
+        await session.commit()
+    return len(rows)
+
+
+@celery_app.task
+def send_reservation_reminders() -> int:
+    """
+    Sends reminders about upcoming reservations
+    """
+    reminded = run_async(send_reminders())
+    if reminded:
+        logger.info("Sent reminders for %s reservations", reminded)
+    return reminded
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import logging
+from ipaddress import ip_address, ip_network
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import Request
+from sqlalchemy import ColumnElement, String, Integer, case, column, update, values
+
+from src.cache import redis_client
+from src.config import (PAYMENTS_WEBHOOK_BATCH_SIZE, PAYMENTS_WEBHOOK_IPS, PAYMENTS_TRUSTED_PROXIES,
+                        PAYMENTS_WEBHOOK_MAX_ATTEMPTS)
+from src.database import async_session_maker
+from src.reservations.payments import PaymentNotFoundError, fetch_payments
+from src.reservations.models import (payment, reservation, RESERVATION_STATUS_PENDING, RESERVATION_STATUS_PAID,
+                                     RESERVATION_STATUS_CANCELED)
+
+"""
+Payment provider notifications.
+The webhook only enqueues notifications to a redis list,
+a consumer in every worker confirms them with the provider
+and applies them to payments and reservations in batches.
+Notifications the provider could not be asked about are retried from the tail of the list,
+after PAYMENTS_WEBHOOK_MAX_ATTEMPTS they are moved to a dead letter list
+"""
+
+logger = logging.getLogger(__name__)
+
+EVENTS_KEY = "payments:events"
+DEAD_EVENTS_KEY = "payments:events:dead"
+BLOCK_SECONDS = 5
+RETRY_DELAY_SECONDS = 1
+
+PAYMENT_STATUS_RANK = {
+    "pending": 0,
+    "waiting_for_capture": 1,
+    "succeeded": 2,
+    "canceled": 2,
+}
+
+RESERVATION_STATUSES = {
+    "succeeded": RESERVATION_STATUS_PAID,
+    "canceled": RESERVATION_STATUS_CANCELED,
+}
+
+webhook_networks = [ip_network(network) for network in PAYMENTS_WEBHOOK_IPS]
+proxy_networks = [ip_network(network) for network in PAYMENTS_TRUSTED_PROXIES]
+
+
+def is_in_networks(host: str, networks: list) -> bool:
+    try:
+        address = ip_address(host.strip())
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def get_sender_address(request: Request) -> Optional[str]:
+    """
+    Returns the peer address, X-Real-IP is used only when the peer is one of PAYMENTS_TRUSTED_PROXIES
+    """
+    if request.client is None:
+        return None
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip is not None and is_in_networks(request.client.host, proxy_networks):
+        return real_ip
+    return request.client.host
+
+
+def is_trusted_sender(host: Optional[str]) -> bool:
+    """
+    Checks the sender against PAYMENTS_WEBHOOK_IPS, nobody is trusted when it is empty
+    """
+    return host is not None and is_in_networks(host, webhook_networks)
+
+
+async def enqueue_payment_event(payment_object: dict) -> None:
+    event = {"id": payment_object["id"], "status": payment_object["status"]}
+    await redis_client.rpush(EVENTS_KEY, json.dumps(event))
+
+
+def get_latest_statuses(events: List[dict]) -> Dict[str, str]:
+    """
+    Collapses events to the most advanced status of every payment
+    """
+    statuses = {}
+    for event in events:
+        status = event["status"]
+        if status not in PAYMENT_STATUS_RANK:
+            continue
+        current = statuses.get(event["id"])
+        if current is None or PAYMENT_STATUS_RANK[status] > PAYMENT_STATUS_RANK[current]:
+            statuses[event["id"]] = status
+    return statuses
+
+
+async def confirm_statuses(statuses: Dict[str, str]) -> Tuple[Dict[str, str], Set[str]]:
+    """
+    Replaces notified statuses with the ones reported by the provider,
+    returns the confirmed statuses and the payments whose lookup failed,
+    notifications about payments unknown to the provider are dropped
+    """
+    confirmed, failed = {}, set()
+    for payment_id, result in (await fetch_payments(statuses)).items():
+        if isinstance(result, PaymentNotFoundError):
+            logger.warning("Dropped notification about unknown payment %s", payment_id)
+        elif isinstance(result, Exception):
+            logger.info("Payment %s was not confirmed: %s", payment_id, result)
+            failed.add(payment_id)
+        elif result.get("status") in PAYMENT_STATUS_RANK:
+            confirmed[payment_id] = result["status"]
+    return confirmed, failed
+
+
+def get_retry_events(events: List[dict], failed: Set[str]) -> List[dict]:
+    """
+    Returns one event per failed payment with its attempt counter increased
+    """
+    retries = {}
+    for event in events:
+        if event["id"] not in failed:
+            continue
+        attempts = event.get("attempts", 0) + 1
+        if event["id"] not in retries or attempts > retries[event["id"]]["attempts"]:
+            retries[event["id"]] = {"id": event["id"], "status": event["status"], "attempts": attempts}
+    return list(retries.values())
+
+
+def get_status_rank(status: ColumnElement) -> ColumnElement:
+    return case(PAYMENT_STATUS_RANK, value=status, else_=-1)
+
+
+async def apply_payment_statuses(statuses: Dict[str, str]) -> None:
+    """
+    Applies payment status transitions with one UPDATE per table,
+    the payment status only moves to a higher rank, so late and replayed events are no-ops
+    """
+    if not statuses:
+        return
+    payment_updates = values(
+        column("id", String), column("status", String), name="payment_updates",
+    ).data(list(statuses.items()))
+    reservation_rows = [
+        (payment_id, RESERVATION_STATUSES[status])
+        for payment_id, status in statuses.items()
+        if status in RESERVATION_STATUSES
+    ]
+
+    async with async_session_maker() as session:
+        stmt = (
+            update(payment)
+            .where(
+                payment.c.id == payment_updates.c.id,
+                get_status_rank(payment_updates.c.status) > get_status_rank(payment.c.status),
+            )
+            .values(status=payment_updates.c.status)
+        )
+        await session.execute(stmt)
+        if reservation_rows:
+            reservation_updates = values(
+                column("payment_id", String), column("status", Integer), name="reservation_updates",
+            ).data(reservation_rows)
+            stmt = (
+                update(reservation)
+                .where(
+                    reservation.c.payment_id == reservation_updates.c.payment_id,
+                    reservation.c.status == RESERVATION_STATUS_PENDING,
+                )
+                .values(status=reservation_updates.c.status)
+            )
+            await session.execute(stmt)
+        await session.commit()
+
+
+async def apply_payment_events(events: List[dict]) -> List[dict]:
+    """
+    Applies the provider-confirmed statuses of the notified payments,
+    returns the events to retry
+    """
+    confirmed, failed = await confirm_statuses(get_latest_statuses(events))
+    await apply_payment_statuses(confirmed)
+    return get_retry_events(events, failed)
+
+
+async def requeue_payment_events(events: List[dict]) -> None:
+    retries = [event for event in events if event["attempts"] < PAYMENTS_WEBHOOK_MAX_ATTEMPTS]
+    dead = [event for event in events if event["attempts"] >= PAYMENTS_WEBHOOK_MAX_ATTEMPTS]
+    async with redis_client.pipeline(transaction=False) as pipe:
+        if retries:
+            pipe.rpush(EVENTS_KEY, *(json.dumps(event) for event in retries))
+        if dead:
+            logger.error("Payments %s were not confirmed after %s attempts",
+                         ", ".join(event["id"] for event in dead), PAYMENTS_WEBHOOK_MAX_ATTEMPTS)
+            pipe.rpush(DEAD_EVENTS_KEY, *(json.dumps(event) for event in dead))
+        await pipe.execute()
+
+
+async def consume_payment_events() -> None:
+    """
+    Pops queued notifications in batches until cancelled
+    """
+    while True:
+        events = []
+        try:
+            first = await redis_client.blpop([EVENTS_KEY], timeout=BLOCK_SECONDS)
+            if first is None:
+                continue
+            events = [first[1], *(await redis_client.lpop(EVENTS_KEY, PAYMENTS_WEBHOOK_BATCH_SIZE - 1) or [])]
+            retries = await apply_payment_events([json.loads(event) for event in events])
+            if retries:
+                await requeue_payment_events(retries)
+                events = []
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
+        except asyncio.CancelledError:
+            if events:
+                await redis_client.lpush(EVENTS_KEY, *reversed(events))
+            raise
+        except Exception as e:
+            logger.warning("Payment events were not applied, retrying: %s", e)
+            if events:
+                await redis_client.lpush(EVENTS_KEY, *reversed(events))
+            await asyncio.sleep(BLOCK_SECONDS)
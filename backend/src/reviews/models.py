@@ -1,9 +1,12 @@
 from datetime import datetime
-from sqlalchemy import MetaData, Integer, Table, Column, Identity, String, ForeignKey, TIMESTAMP
+from sqlalchemy import MetaData, Integer, Table, Column, Identity, String, ForeignKey, TIMESTAMP, Index, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from src.users.models import user
 
 metadata = MetaData()
 
+SEARCH_CONFIGS = ('russian', 'english')
+
 review = Table(
     'review',
     metadata,
@@ -12,5 +15,26 @@ review = Table(
     Column('station_id', Integer, nullable=False),
     Column('rating', Integer, nullable=False),
     Column('comment', String, nullable=True),
-    Column('created_at', TIMESTAMP, default=datetime.utcnow),
+    Column('created_at', TIMESTAMP, default=datetime.utcnow, nullable=False),
+    Column('comment_tsv', TSVECTOR, Computed(
+        " || ".join(f"to_tsvector('{config}', coalesce(comment, ''))" for config in SEARCH_CONFIGS),
+        persisted=True,
+    )),
+    Index('ix_review_station_id_created_at', 'station_id', 'created_at', 'id'),
+    Index('ix_review_station_id_rating', 'station_id', 'rating', 'id'),
+    Index('ix_review_comment_tsv', 'comment_tsv', postgresql_using='gin'),
+)
+
+review_columns = [column for column in review.c if column.name != 'comment_tsv']
+
+
+RATING_STARS = range(1, 6)
+
+station_rating_stats = Table(
+    'station_rating_stats',
+    metadata,
+    Column('station_id', Integer, primary_key=True),
+    Column('reviews_count', Integer, nullable=False, default=0),
+    Column('rating_sum', Integer, nullable=False, default=0),
+    *[Column(f'rating_{star}', Integer, nullable=False, default=0) for star in RATING_STARS],
 )
@@ -1,12 +1,15 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime
+from typing import Literal, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select, insert, update, delete
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, insert, update, delete, tuple_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_async_session
-from src.reviews.models import review
+from src.database import get_async_session, get_read_session, read_from_primary
+from src.reviews.models import review, review_columns, station_rating_stats, SEARCH_CONFIGS
 from src.reviews.schemas import ReviewCreate, ReviewUpdate
+from src.reviews.stats import add_rating, move_rating
 from src.users.models import User
 from src.users.utils import current_verified_user
 
@@ -15,14 +18,58 @@ router = APIRouter(
     tags=["reviews"],
 )
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_SEARCH_OFFSET = 1000
+
+
+@router.get("/search")
+async def search_reviews(
+        q: str = Query(..., min_length=1, max_length=200, description="Поисковый запрос"),
+        station_id: Optional[int] = None,
+        rating_from: Optional[int] = Query(None, description="Минимальная оценка"),
+        rating_to: Optional[int] = Query(None, description="Максимальная оценка"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+        session: AsyncSession = Depends(get_read_session)) -> dict:
+    """
+    Search reviews by comment text, best matches first
+    """
+    try:
+        queries = [func.websearch_to_tsquery(config, q) for config in SEARCH_CONFIGS]
+        ts_query = queries[0]
+        for config_query in queries[1:]:
+            ts_query = ts_query.op("||")(config_query)
+        rank = func.ts_rank(review.c.comment_tsv, ts_query).label("rank")
+        query = (
+            select(*review_columns, rank)
+            .where(review.c.comment_tsv.op("@@")(ts_query))
+            .order_by(rank.desc(), review.c.id.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        if station_id is not None:
+            query = query.where(review.c.station_id == station_id)
+        if rating_from is not None:
+            query = query.where(review.c.rating >= rating_from)
+        if rating_to is not None:
+            query = query.where(review.c.rating <= rating_to)
+        result = await session.execute(query)
+        return {
+            "status": "ok",
+            "data": [dict(row) for row in result.mappings().all()],
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 @router.get("/{review_id}")
-async def get_review(review_id: int, session: AsyncSession = Depends(get_async_session)) -> dict:
+async def get_review(review_id: int, session: AsyncSession = Depends(get_read_session)) -> dict:
     """
     Get a review by ID
     """
     try:
-        query = select(review).where(review.c.id == review_id)
+        query = select(*review_columns).where(review.c.id == review_id)
         result = await session.execute(query)
         data = result.mappings().one()
         if not data:
@@ -35,21 +82,67 @@ async def get_review(review_id: int, session: AsyncSession = Depends(get_async_s
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def encode_cursor(sort_value: Union[datetime, int], review_id: int) -> str:
+    value = sort_value.isoformat() if isinstance(sort_value, datetime) else str(sort_value)
+    return urlsafe_b64encode(f"{value}|{review_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Union[datetime, int], int]:
+    try:
+        sort_value, review_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return (datetime.fromisoformat(sort_value) if sort == "newest" else int(sort_value)), int(review_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/by_station/{station_id}")
-async def get_reviews_by_station(station_id: int, session: AsyncSession = Depends(get_async_session)) -> dict:
+async def get_reviews_by_station(
+        station_id: int,
+        cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        sort: Literal["newest", "rating"] = Query("newest", description="Сначала новые или с высокой оценкой"),
+        with_comments: bool = Query(True, description="Включить текст отзывов"),
+        with_total: bool = Query(False, description="Вернуть общее количество отзывов"),
+        session: AsyncSession = Depends(get_read_session)) -> dict:
+    """
+    Get reviews of a station page by page
+    """
     try:
-        query = select(review).where(review.c.station_id == station_id)
-        result = await session.execute(query)
-        data = result.mappings().all()
-        return {
+        sort_column = review.c.created_at if sort == "newest" else review.c.rating
+        columns = [column for column in review_columns if with_comments or column.name != "comment"]
+        query = (
+            select(*columns)
+            .where(review.c.station_id == station_id)
+            .order_by(sort_column.desc(), review.c.id.desc())
+        )
+        if cursor is not None:
+            query = query.where(tuple_(sort_column, review.c.id) < tuple_(*decode_cursor(cursor, sort)))
+        result = await session.execute(query.limit(limit + 1))
+        data = [dict(row) for row in result.mappings().all()]
+        next_cursor = None
+        if len(data) > limit:
+            data = data[:limit]
+            next_cursor = encode_cursor(data[-1]["created_at" if sort == "newest" else "rating"], data[-1]["id"])
+
+        response = {
             "status": "ok",
-            "data": [dict(d) for d in data],
+            "data": data,
+            "next_cursor": next_cursor,
         }
+        if with_total:
+            total = await session.execute(
+                select(station_rating_stats.c.reviews_count).where(station_rating_stats.c.station_id == station_id)
+            )
+            response["total"] = total.scalar() or 0
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
 @router.post("/", response_model=ReviewCreate)
-async def create_review(review_create: ReviewCreate,
+async def create_review(review_create: ReviewCreate, response: Response,
                         current_user: User = Depends(current_verified_user),
                         session: AsyncSession = Depends(get_async_session)) -> dict:
     """
@@ -62,23 +155,37 @@ async def create_review(review_create: ReviewCreate,
         review_data["created_at"] = datetime.utcnow()
         stmt = insert(review).values(**review_data)
         await session.execute(stmt)
+        await add_rating(session, review_data["station_id"], review_data["rating"], 1)
         await session.commit()
+        read_from_primary(response)
         return review_create.dict()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.put("/{review_id}")
-async def update_review(review_id: int, updated_review: ReviewUpdate,
+async def update_review(review_id: int, updated_review: ReviewUpdate, response: Response,
                         session: AsyncSession = Depends(get_async_session)) -> dict:
     """
     Update a review by ID
     """
     try:
         existing_review = await get_review(review_id, session)
-        stmt = update(review).where(review.c.id == review_id).values(**updated_review.dict(exclude_unset=True))
-        await session.execute(stmt)
+        update_data = updated_review.dict(exclude_unset=True)
+        if "rating" in update_data:
+            update_data["rating"] = int(update_data["rating"])
+        query = select(review.c.station_id, review.c.rating).where(review.c.id == review_id).with_for_update()
+        old_rating = tuple((await session.execute(query)).one())
+        stmt = (
+            update(review)
+            .where(review.c.id == review_id)
+            .values(**update_data)
+            .returning(review.c.station_id, review.c.rating)
+        )
+        new_rating = tuple((await session.execute(stmt)).one())
+        await move_rating(session, old_rating, new_rating)
         await session.commit()
+        read_from_primary(response)
         return {
             "status": "ok",
             "data": {**existing_review["data"], **updated_review.dict()},
@@ -93,15 +200,19 @@ async def update_review(review_id: int, updated_review: ReviewUpdate,
 
 
 @router.delete("/{review_id}")
-async def delete_review(review_id: int, session: AsyncSession = Depends(get_async_session)) -> dict:
+async def delete_review(review_id: int, response: Response,
+                        session: AsyncSession = Depends(get_async_session)) -> dict:
     """
     Delete a review by ID
     """
     try:
         existing_review = await get_review(review_id, session)
-        stmt = delete(review).where(review.c.id == review_id)
-        await session.execute(stmt)
+        stmt = delete(review).where(review.c.id == review_id).returning(review.c.station_id, review.c.rating)
+        deleted = (await session.execute(stmt)).one_or_none()
+        if deleted is not None:
+            await add_rating(session, deleted.station_id, deleted.rating, -1)
         await session.commit()
+        read_from_primary(response)
         return {
             "status": "ok",
             "data": existing_review["data"],
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import async_session_maker
+from src.reviews.models import review, station_rating_stats, RATING_STARS
+
+"""
+Per-station rating aggregates.
+Review writers adjust the row of the station in the same transaction,
+rebuild_rating_stats recomputes all rows from reviews for backfills:
+
+    python -m src.reviews.stats
+"""
+
+
+def star_column(star: int) -> str:
+    return f"rating_{star}"
+
+
+async def add_rating(session: AsyncSession, station_id: int, rating: int, delta: int) -> None:
+    """
+    Adds (delta=1) or removes (delta=-1) a single rating of the station
+    """
+    values = {"station_id": station_id, "reviews_count": delta, "rating_sum": rating * delta}
+    if rating in RATING_STARS:
+        values[star_column(rating)] = delta
+    stmt = pg_insert(station_rating_stats).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[station_rating_stats.c.station_id],
+        set_={
+            name: station_rating_stats.c[name] + stmt.excluded[name]
+            for name in values if name != "station_id"
+        },
+    )
+    await session.execute(stmt)
+
+
+async def move_rating(session: AsyncSession, old: Optional[Tuple[int, int]], new: Optional[Tuple[int, int]]) -> None:
+    """
+    Replaces an old (station_id, rating) with a new one, stations are locked in id order
+    so concurrent moves between the same stations do not deadlock
+    """
+    if old == new:
+        return
+    changes = [(*old, -1)] if old is not None else []
+    if new is not None:
+        changes.append((*new, 1))
+    for station_id, rating, delta in sorted(changes):
+        await add_rating(session, station_id, rating, delta)
+
+
+async def rebuild_rating_stats(session: AsyncSession) -> None:
+    """
+    Recomputes aggregates of every station, review writes wait until the rebuild is committed
+    """
+    await session.execute(text("LOCK TABLE review IN SHARE MODE"))
+    await session.execute(delete(station_rating_stats))
+    query = (
+        select(
+            review.c.station_id,
+            func.count(),
+            func.sum(review.c.rating),
+            *[func.count().filter(review.c.rating == star) for star in RATING_STARS],
+        )
+        .group_by(review.c.station_id)
+    )
+    columns = ["station_id", "reviews_count", "rating_sum", *[star_column(star) for star in RATING_STARS]]
+    await session.execute(insert(station_rating_stats).from_select(columns, query))
+
+
+async def main() -> None:
+    async with async_session_maker() as session:
+        await rebuild_rating_stats(session)
+        await session.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import logging
+from typing import Optional, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import redis_client
+from src.stations.models import station
+
+"""
+In-process station catalog cache.
+Writers bump a version counter in redis, every worker keeps the serialized catalog
+of the version it loaded and reloads it only when the counter moves
+"""
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "stations:version"
+
+
+class StationCatalog:
+    """
+    Serialized station list with its strong ETag
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.body = b""
+        self.etag = ""
+
+    def set(self, version: Optional[int], body: bytes) -> None:
+        self.version = version
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+catalog = StationCatalog()
+
+
+async def load_catalog(session: AsyncSession) -> bytes:
+    result = await session.execute(select(station).order_by(station.c.id))
+    return json.dumps([dict(row) for row in result.mappings().all()], ensure_ascii=False).encode()
+
+
+async def get_station_catalog(session: AsyncSession) -> Tuple[bytes, str]:
+    """
+    Returns the serialized catalog and its ETag, querying the database only after the catalog changed
+    """
+    try:
+        version = int(await redis_client.get(VERSION_KEY) or 0)
+    except RedisError as e:
+        logger.warning("Station catalog version is unavailable: %s", e)
+        version = None
+    if version is None or version != catalog.version:
+        catalog.set(version, await load_catalog(session))
+    return catalog.body, catalog.etag
+
+
+async def bump_catalog_version() -> None:
+    """
+    Makes every worker reload the catalog on its next read
+    """
+    catalog.version = None
+    try:
+        await redis_client.incr(VERSION_KEY)
+    except RedisError as e:
+        logger.warning("Station catalog version was not bumped: %s", e)
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select, insert, update, delete
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from sqlalchemy import select, insert, update, delete, func, cast, Numeric
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_async_session
+from src.database import get_async_session, get_read_session
+from src.reservations.cache import get_occupancy, invalidate_stations
+from src.reservations.holds import apply_holds
+from src.reservations.slots import day_bounds, next_free_slot
+from src.reviews.models import station_rating_stats
+from src.stations.cache import get_station_catalog, bump_catalog_version
 from src.stations.models import station
 from src.stations.schemas import StationCreate, StationUpdate
 from src.users.models import user
@@ -22,33 +30,84 @@ async def create_station(station_create: StationCreate,
     Create a new station
     """
     try:
-        if await is_admin(current_user.id, session) or await is_staff(current_user.id, session):
+        if is_admin(current_user) or is_staff(current_user):
             stmt = insert(station).values(**station_create.dict())
             await session.execute(stmt)
             await session.commit()
+            await invalidate_stations()
+            await bump_catalog_version()
             return station_create
         else:
             raise HTTPException(status_code=403, detail="Forbidden")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def is_etag_matched(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+
 @router.get("/")
-async def get_all_stations(session: AsyncSession = Depends(get_async_session)):
+async def get_all_stations(if_none_match: Optional[str] = Header(None),
+                           session: AsyncSession = Depends(get_async_session)) -> Response:
     """
-    Get a station by ID
+    Get all stations, answers 304 when the client already has the current catalog
     """
     try:
-        query = select(station)
+        body, etag = await get_station_catalog(session)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if is_etag_matched(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/summary")
+async def get_stations_summary(session: AsyncSession = Depends(get_read_session)) -> dict:
+    """
+    Get all stations with review count, average rating and next free slot today
+    """
+    try:
+        query = (
+            select(
+                station,
+                func.coalesce(station_rating_stats.c.reviews_count, 0).label("reviews_count"),
+                func.round(
+                    cast(station_rating_stats.c.rating_sum, Numeric) / func.nullif(station_rating_stats.c.reviews_count, 0),
+                    2,
+                ).label("average_rating"),
+            )
+            .select_from(station)
+            .outerjoin(station_rating_stats, station_rating_stats.c.station_id == station.c.id)
+            .order_by(station.c.id)
+        )
         result = await session.execute(query)
-        data = result.mappings().all()
-        return [dict(d) for d in data]
+        data = [dict(row) for row in result.mappings().all()]
+
+        now = datetime.now()
+        today = now.date()
+        day_start, _ = day_bounds(today)
+        occupancy = await apply_holds(await get_occupancy(today, today, session))
+        for item in data:
+            if item["average_rating"] is not None:
+                item["average_rating"] = float(item["average_rating"])
+            station_days = occupancy.get(item["id"])
+            item["next_free_slot"] = (
+                next_free_slot(station_days[today], day_start, now) if station_days is not None else None
+            )
+        return {
+            "status": "ok",
+            "data": data,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
 @router.get("/{station_id}")
 async def get_station(station_id: int,
                       current_user: user = Depends(current_verified_user),
-                      session: AsyncSession = Depends(get_async_session)):
+                      session: AsyncSession = Depends(get_read_session)):
     """
     Get a station by ID
     """
@@ -71,8 +130,8 @@ async def update_station(station_id: int, updated_station: StationUpdate,
     Update a station by ID
     """
     try:
-        if is_admin(current_user.id, session) or is_staff(current_user.id, session):
-            existing_station = await get_station(station_id, session)
+        if is_admin(current_user) or is_staff(current_user):
+            existing_station = await get_station(station_id, current_user, session)
             update_data = updated_station.dict(exclude_unset=True)
 
             if "type" in update_data and update_data["type"] not in ["pc", "ps", "vr"]:
@@ -87,6 +146,8 @@ async def update_station(station_id: int, updated_station: StationUpdate,
             )
             await session.execute(stmt)
             await session.commit()
+            await invalidate_stations()
+            await bump_catalog_version()
 
             return {
                 "status": "ok",
@@ -115,11 +176,13 @@ async def delete_station(station_id: int,
     Delete a station by ID
     """
     try:
-        if is_admin(current_user.id, session) or is_staff(current_user.id, session):
-            await get_station(station_id, session)
+        if is_admin(current_user) or is_staff(current_user):
+            await get_station(station_id, current_user, session)
             stmt = delete(station).where(station.c.id == station_id)
             await session.execute(stmt)
             await session.commit()
+            await invalidate_stations()
+            await bump_catalog_version()
             return {
                 "status": "ok",
                 "data": None,
@@ -0,0 +1,123 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from src.cache import redis_client
+from src.config import USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_REDIS, USER_CACHE_REDIS_TTL
+from src.users.models import User
+
+"""
+Cache of users resolved from auth tokens.
+Every worker keeps a small LRU with a short TTL in front of an optional redis tier,
+UserManager drops both tiers whenever a user changes.
+Password hashes are never cached
+"""
+
+logger = logging.getLogger(__name__)
+
+DATETIME_FIELDS = ("registered_at",)
+EXCLUDED_FIELDS = ("hashed_password",)
+
+
+def user_key(user_id: int) -> str:
+    return f"users:{user_id}"
+
+
+class UserCache:
+    """
+    Bounded in-process LRU of user columns with a TTL
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict[int, Tuple[float, dict]] = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[dict]:
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self.entries[user_id]
+            return None
+        self.entries.move_to_end(user_id)
+        return data
+
+    def set(self, user_id: int, data: dict) -> None:
+        self.entries[user_id] = (time.monotonic() + self.ttl, data)
+        self.entries.move_to_end(user_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def discard(self, user_id: int) -> None:
+        self.entries.pop(user_id, None)
+
+
+local_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+def dump_user(user: User) -> dict:
+    return {
+        attr.key: getattr(user, attr.key)
+        for attr in inspect(User).column_attrs
+        if attr.key not in EXCLUDED_FIELDS
+    }
+
+
+def load_user(data: dict) -> User:
+    """
+    Builds a detached user, so it can be attached to a request session and updated,
+    excluded fields are left unloaded
+    """
+    user = User(**data)
+    make_transient_to_detached(user)
+    return user
+
+
+async def get_cached_user(user_id: int) -> Optional[User]:
+    data = local_cache.get(user_id)
+    if data is None and USER_CACHE_REDIS:
+        try:
+            cached = await redis_client.get(user_key(user_id))
+        except RedisError as e:
+            logger.warning("User cache is unavailable: %s", e)
+            cached = None
+        if cached is not None:
+            data = json.loads(cached)
+            for field in DATETIME_FIELDS:
+                if data.get(field) is not None:
+                    data[field] = datetime.fromisoformat(data[field])
+            local_cache.set(user_id, data)
+    return load_user(data) if data is not None else None
+
+
+async def cache_user(user: User) -> None:
+    data = dump_user(user)
+    local_cache.set(user.id, data)
+    if USER_CACHE_REDIS:
+        try:
+            await redis_client.set(user_key(user.id), json.dumps(data, default=datetime.isoformat),
+                                   ex=USER_CACHE_REDIS_TTL)
+        except RedisError as e:
+            logger.warning("User cache is unavailable: %s", e)
+
+
+async def invalidate_user(user_id: int) -> None:
+    """
+    Drops the user from both tiers, other workers keep their copy for at most USER_CACHE_TTL seconds
+    """
+    local_cache.discard(user_id)
+    if USER_CACHE_REDIS:
+        try:
+            await redis_client.delete(user_key(user_id))
+        except RedisError as e:
+            logger.warning("User cache invalidation failed, entries expire in %s s: %s",
+                           USER_CACHE_REDIS_TTL, e)
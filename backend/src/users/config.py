@@ -1,10 +1,15 @@
+from typing import Optional
+
+import jwt
 from fastapi_users.authentication import CookieTransport, JWTStrategy, AuthenticationBackend
-from fastapi_users import FastAPIUsers
+from fastapi_users import BaseUserManager, FastAPIUsers, exceptions
+from fastapi_users.jwt import decode_jwt
 from src.database import get_async_session
 from fastapi import Depends
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.users.models import User
+from src.users.cache import get_cached_user, cache_user
 from src.users.manager import UserManager
 from src.config import JWT_SECRET
 
@@ -17,10 +22,36 @@ cookie_transport = CookieTransport(
     cookie_samesite="lax",
 )
 
+class CachedJWTStrategy(JWTStrategy):
+    """
+    JWT strategy resolving token users through the user cache,
+    UserManager.get stays uncached for verification and password reset
+    """
+
+    async def read_token(self, token: Optional[str], user_manager: BaseUserManager) -> Optional[User]:
+        if token is None:
+            return None
+        try:
+            data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+            if data.get("sub") is None:
+                return None
+            user_id = user_manager.parse_id(data["sub"])
+        except (jwt.PyJWTError, exceptions.InvalidID):
+            return None
+
+        cached_user = await get_cached_user(user_id)
+        if cached_user is not None:
+            return cached_user
+        try:
+            user = await user_manager.get(user_id)
+        except exceptions.UserNotExists:
+            return None
+        await cache_user(user)
+        return user
 
 
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(
+    return CachedJWTStrategy(
         secret=JWT_SECRET,
         lifetime_seconds=3600,
     )
@@ -0,0 +1,97 @@
+import logging
+import time
+from email.message import EmailMessage
+from smtplib import SMTP_SSL, SMTPException, SMTPServerDisconnected
+from typing import Optional
+
+from celery.signals import worker_process_shutdown
+
+from src.config import SMTP_USER, SMTP_HOST, SMTP_PASS, SMTP_PORT, SMTP_TIMEOUT, SMTP_MAX_PER_SECOND
+
+"""
+SMTP delivery for celery workers.
+Every worker process keeps one authenticated connection
+and reopens it when the server drops it
+"""
+
+logger = logging.getLogger(__name__)
+
+IDLE_CHECK_SECONDS = 30
+
+
+def is_connection_lost(error: OSError) -> bool:
+    """
+    SMTP errors subclass OSError, only a disconnect among them means the connection is gone
+    """
+    return isinstance(error, SMTPServerDisconnected) or not isinstance(error, SMTPException)
+
+
+class SmtpConnection:
+    """
+    Lazily opened SMTP connection with a per-process send rate limit
+    """
+
+    def __init__(self, max_per_second: float):
+        self.interval = 1 / max_per_second if max_per_second > 0 else 0
+        self.server: Optional[SMTP_SSL] = None
+        self.last_used = 0.0
+
+    def connect(self) -> SMTP_SSL:
+        server = SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        try:
+            server.login(SMTP_USER, SMTP_PASS)
+        except OSError:
+            server.close()
+            raise
+        return server
+
+    def get(self) -> SMTP_SSL:
+        """
+        Returns the open connection, checking it with NOOP after it was idle
+        """
+        if self.server is not None and time.monotonic() - self.last_used > IDLE_CHECK_SECONDS:
+            try:
+                self.server.noop()
+            except OSError:
+                self.close()
+        if self.server is None:
+            self.server = self.connect()
+        return self.server
+
+    def throttle(self) -> None:
+        wait = self.last_used + self.interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def send(self, email: EmailMessage) -> None:
+        """
+        Sends the email, reconnecting once if the connection was lost
+        """
+        self.throttle()
+        try:
+            self.get().send_message(email)
+        except OSError as e:
+            if not is_connection_lost(e):
+                raise
+            logger.info("SMTP connection was lost, reconnecting: %s", e)
+            self.close()
+            self.get().send_message(email)
+        finally:
+            self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except OSError:
+            self.server.close()
+        self.server = None
+
+
+smtp_connection = SmtpConnection(SMTP_MAX_PER_SECOND)
+
+
+@worker_process_shutdown.connect
+def close_smtp_connection(**kwargs) -> None:
+    smtp_connection.close()
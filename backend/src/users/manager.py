@@ -1,14 +1,49 @@
-from typing import Optional
+import logging
+from typing import Any, Dict, List, Optional
 from fastapi import Request
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import BaseUserManager, IntegerIDMixin, exceptions, models, schemas
 from celery import Celery
-from smtplib import SMTP_SSL
+from smtplib import SMTPRecipientsRefused
 from email.message import EmailMessage
 
+from src.users.cache import invalidate_user
+from src.users.mail import smtp_connection
 from src.users.models import User
-from src.config import SMTP_USER, SMTP_HOST, SMTP_PASS, SMTP_PORT, CELERY_BROKER_URL, USER_MANAGER_SECRET
-
-celery_app = Celery("users", broker_url=CELERY_BROKER_URL)
+from src.users.passwords import password_pool
+from src.config import (SMTP_USER, SMTP_BATCH_SIZE, SMTP_MAX_RETRIES, CELERY_BROKER_URL, USER_MANAGER_SECRET,
+                        EXPIRED_RESERVATIONS_INTERVAL, REMINDER_INTERVAL, PAYMENTS_WEBHOOKS_ENABLED)
+
+logger = logging.getLogger(__name__)
+
+SMTP_RETRY_BACKOFF = 10
+SMTP_RETRY_BACKOFF_MAX = 600
+
+celery_app = Celery("users", broker_url=CELERY_BROKER_URL, include=["src.reservations.tasks"])
+celery_app.conf.beat_schedule = {
+    "send-reservation-reminders": {
+        "task": "src.reservations.tasks.send_reservation_reminders",
+        "schedule": REMINDER_INTERVAL,
+    },
+}
+# without payment notifications paid reservations never leave the pending status
+if PAYMENTS_WEBHOOKS_ENABLED:
+    celery_app.conf.beat_schedule["release-expired-reservations"] = {
+        "task": "src.reservations.tasks.release_expired_reservations",
+        "schedule": EXPIRED_RESERVATIONS_INTERVAL,
+    }
+
+
+def get_message(user_email: str, subject: str, content: str) -> EmailMessage:
+    """
+    Returns an html email to the user email
+    """
+    email = EmailMessage()
+    email['Subject'] = subject
+    email['From'] = SMTP_USER
+    email['To'] = user_email
+    email.set_content(content, subtype='html')
+    return email
 
 
 def get_email(
@@ -20,22 +55,22 @@ def get_email(
     """
     Returns an email template for verification email
     """
-    email = EmailMessage()
-    email['Subject'] = subject
-    email['From'] = SMTP_USER
-    email['To'] = user_email
-
-    email.set_content(
+    return get_message(
+        user_email,
+        subject,
         '<div>'
         f'{username}, Ваш код подтверждения: {token}'
         '</div>',
-        subtype='html'
     )
-    return email
 
 
-@celery_app.task
+def get_retry_countdown(retries: int) -> int:
+    return min(SMTP_RETRY_BACKOFF * 2 ** retries, SMTP_RETRY_BACKOFF_MAX)
+
+
+@celery_app.task(bind=True, max_retries=SMTP_MAX_RETRIES)
 def send_email(
+        self,
         username: str,
         user_email: str,
         token: str,
@@ -45,9 +80,35 @@ def send_email(
     Sends an email to user email
     """
     email = get_email(username, user_email, token, subject)
-    with SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-        server.login(SMTP_USER, SMTP_PASS)
-        server.send_message(email)
+    try:
+        smtp_connection.send(email)
+    except SMTPRecipientsRefused as e:
+        logger.warning("Email to %s was refused: %s", user_email, e)
+    except OSError as e:
+        raise self.retry(exc=e, countdown=get_retry_countdown(self.request.retries))
+
+
+@celery_app.task(bind=True, max_retries=SMTP_MAX_RETRIES)
+def send_emails(self, messages: List[dict]) -> None:
+    """
+    Sends a batch of {"user_email", "subject", "content"} messages over one connection,
+    the unsent rest of the batch is retried with backoff
+    """
+    for index, message in enumerate(messages):
+        try:
+            smtp_connection.send(get_message(**message))
+        except SMTPRecipientsRefused as e:
+            logger.warning("Email to %s was refused: %s", message["user_email"], e)
+        except OSError as e:
+            raise self.retry(args=[messages[index:]], exc=e, countdown=get_retry_countdown(self.request.retries))
+
+
+def enqueue_emails(messages: List[dict]) -> None:
+    """
+    Enqueues messages in batches of SMTP_BATCH_SIZE
+    """
+    for start in range(0, len(messages), SMTP_BATCH_SIZE):
+        send_emails.delay(messages[start:start + SMTP_BATCH_SIZE])
 
 
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
@@ -75,7 +136,7 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
             else user_create.create_update_dict_superuser()
         )
         password = user_dict.pop("password")
-        user_dict["hashed_password"] = self.password_helper.hash(password)
+        user_dict["hashed_password"] = await password_pool.hash(password)
         user_dict['role_id'] = 1
 
         created_user = await self.user_db.create(user_dict)
@@ -84,6 +145,40 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
 
         return created_user
 
+    async def authenticate(
+            self,
+            credentials: OAuth2PasswordRequestForm
+    ) -> Optional[models.UP]:
+        """
+        Authenticates a user by email and password, verifying the password on the hashing pool
+        """
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            await password_pool.hash(credentials.password)
+            return None
+
+        verified, updated_password_hash = await password_pool.verify_and_update(
+            credentials.password, user.hashed_password
+        )
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            await self.user_db.update(user, {"hashed_password": updated_password_hash})
+        return user
+
+    async def _update(self, user: models.UP, update_dict: Dict[str, Any]) -> models.UP:
+        """
+        Hashes a new password on the hashing pool before the regular update
+        """
+        password = update_dict.get("password")
+        if password is not None:
+            await self.validate_password(password, user)
+            update_dict = {key: value for key, value in update_dict.items() if key != "password"}
+            update_dict["hashed_password"] = await password_pool.hash(password)
+        return await super()._update(user, update_dict)
+
     async def on_after_request_verify(
             self,
             user: User,
@@ -107,4 +202,31 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
         """
         send_email.delay(user.username, user.email, token, "Восстановление пароля")
 
+    async def on_after_update(
+            self,
+            user: User,
+            update_dict: Dict[str, Any],
+            request: Optional[Request] = None
+    ) -> None:
+        await invalidate_user(user.id)
 
+    async def on_after_verify(
+            self,
+            user: User,
+            request: Optional[Request] = None
+    ) -> None:
+        await invalidate_user(user.id)
+
+    async def on_after_reset_password(
+            self,
+            user: User,
+            request: Optional[Request] = None
+    ) -> None:
+        await invalidate_user(user.id)
+
+    async def on_after_delete(
+            self,
+            user: User,
+            request: Optional[Request] = None
+    ) -> None:
+        await invalidate_user(user.id)
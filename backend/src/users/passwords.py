@@ -0,0 +1,64 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException
+from fastapi_users.password import PasswordHelper
+
+from src.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE
+
+"""
+Password hashing off the event loop.
+argon2 and bcrypt release the GIL, so a small thread pool hashes in parallel
+while the loop keeps serving other requests
+"""
+
+T = TypeVar("T")
+
+
+class PasswordHasherPool:
+    """
+    Runs password hashing and verification on a bounded thread pool,
+    requests beyond the queue size are rejected with 503
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.helper = PasswordHelper()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="passwords")
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many authentication requests")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(self.helper.hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self.run(self.helper.verify_and_update, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "running": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_pool = PasswordHasherPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE)
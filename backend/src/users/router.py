@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from src.users.models import user
+from src.users.passwords import password_pool
+from src.users.utils import current_verified_user, is_admin
+
+router = APIRouter(
+    prefix="/users",
+    tags=["users"],
+)
+
+
+@router.get("/passwords/stats")
+async def get_password_pool_stats(current_user: user = Depends(current_verified_user)) -> dict:
+    """
+    Get load of the password hashing pool
+    """
+    try:
+        if not is_admin(current_user):
+            raise HTTPException(status_code=403, detail="Forbidden")
+        return {
+            "status": "ok",
+            "data": password_pool.stats(),
+        }
+    except HTTPException as e:
+        return {
+            "status": "error",
+            "data": str(e.detail),
+        }
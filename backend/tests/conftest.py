@@ -0,0 +1,15 @@
+import os
+
+"""
+The app modules build their database engines from the DB_* settings on import,
+engines connect lazily, so placeholders let the unit tests import them without a database
+"""
+
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "test",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from src.reservations import router as reservations_router
+from src.reviews import router as reviews_router
+
+"""
+Keyset pagination cursors of the reservation and review listings
+"""
+
+
+def test_reservation_cursor_round_trip():
+    start_time = datetime(2030, 6, 15, 13, 30)
+    cursor = reservations_router.encode_cursor(start_time, 42)
+    assert reservations_router.decode_cursor(cursor) == (start_time, 42)
+
+
+@pytest.mark.parametrize("sort, sort_value", [
+    ("newest", datetime(2030, 6, 15, 13, 30, 15, 123456)),
+    ("rating", 5),
+])
+def test_review_cursor_round_trip(sort: str, sort_value):
+    cursor = reviews_router.encode_cursor(sort_value, 7)
+    assert reviews_router.decode_cursor(cursor, sort) == (sort_value, 7)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "MjAzMA==", "YWJjfGRlZg=="])
+def test_invalid_reservation_cursor(cursor: str):
+    with pytest.raises(HTTPException) as e:
+        reservations_router.decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def test_review_cursor_of_another_sort():
+    cursor = reviews_router.encode_cursor(datetime(2030, 6, 15), 7)
+    with pytest.raises(HTTPException) as e:
+        reviews_router.decode_cursor(cursor, "rating")
+    assert e.value.status_code == 400
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa", reason="fakeredis runs Lua scripts with lupa")
+
+from src.reservations import cache, holds  # noqa: E402
+from src.reservations.slots import SLOT_STEP, day_bounds  # noqa: E402
+
+"""
+The slot hold and the availability fill Lua scripts, run against fakeredis
+"""
+
+STATION_ID = 1
+DAY = date(2030, 6, 15)
+DAY_START, _ = day_bounds(DAY)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(holds, "redis_client", client)
+    monkeypatch.setattr(holds, "hold_script", client.register_script(holds.HOLD_SCRIPT))
+    monkeypatch.setattr(cache, "redis_client", client)
+    monkeypatch.setattr(cache, "fill_script", client.register_script(cache.FILL_SCRIPT))
+    return client
+
+
+def slot(index: int, slots: int = 1):
+    return DAY_START + index * SLOT_STEP, DAY_START + (index + slots) * SLOT_STEP
+
+
+def test_hold_blocks_other_users(redis):
+    async def run():
+        assert await holds.acquire_hold(STATION_ID, *slot(1, 2), user_id=1) is not None
+        assert await holds.acquire_hold(STATION_ID, *slot(2), user_id=2) is None
+        assert await holds.acquire_hold(STATION_ID, *slot(3), user_id=2) is not None
+        assert await holds.acquire_hold(STATION_ID, *slot(2), user_id=1) is not None
+        assert await holds.is_time_slot_held(2, (STATION_ID, *slot(1)))
+        assert not await holds.is_time_slot_held(1, (STATION_ID, *slot(1, 2)))
+        occupancy = await holds.apply_holds({STATION_ID: {DAY: 0b1}})
+        assert occupancy == {STATION_ID: {DAY: 0b1111}}
+
+    asyncio.run(run())
+
+
+def test_expired_holds_are_dropped(redis):
+    async def run():
+        key = holds.holds_key(STATION_ID, DAY)
+        now = holds.now_ms()
+        assert await holds.hold_script(keys=[key], args=[1, now, now + 1000, 4])
+        assert not await holds.hold_script(keys=[key], args=[2, now, now + 1000, 4])
+        assert await holds.hold_script(keys=[key], args=[2, now + 2000, now + 3000, 4])
+        assert await redis.zrange(key, 0, -1) == ["4:2"]
+        assert await redis.pexpiretime(key) == now + 3000
+
+    asyncio.run(run())
+
+
+def test_released_hold_frees_the_slots(redis):
+    async def run():
+        await holds.acquire_hold(STATION_ID, *slot(1), user_id=1)
+        await holds.release_holds(1, (STATION_ID, *slot(1)))
+        assert not await holds.is_time_slot_held(2, (STATION_ID, *slot(1)))
+
+    asyncio.run(run())
+
+
+def test_fill_stores_masks_of_unchanged_generations(redis):
+    async def run():
+        other_day = DAY + timedelta(days=1)
+        keys = [
+            cache.occupancy_key(STATION_ID, DAY), cache.generation_key(STATION_ID, DAY),
+            cache.occupancy_key(STATION_ID, other_day), cache.generation_key(STATION_ID, other_day),
+        ]
+        await cache.invalidate_occupancy((STATION_ID, *slot(1)))
+        written = await cache.fill_script(keys=keys, args=[60, "", 0b10, "", 0b1])
+        assert written == 1
+        assert await redis.get(cache.occupancy_key(STATION_ID, DAY)) is None
+        assert await redis.get(cache.occupancy_key(STATION_ID, other_day)) == str(0b1)
+        assert 0 < await redis.ttl(cache.occupancy_key(STATION_ID, other_day)) <= 60
+        assert await cache.fill_script(keys=keys[:2], args=[60, "1", 0b10]) == 1
+        assert await redis.get(cache.occupancy_key(STATION_ID, DAY)) == str(0b10)
+
+    asyncio.run(run())
+
+
+def test_invalidation_drops_every_touched_day(redis):
+    async def run():
+        next_day_start, _ = day_bounds(DAY + timedelta(days=1))
+        for day in (DAY, DAY + timedelta(days=1)):
+            await redis.set(cache.occupancy_key(STATION_ID, day), 1)
+        await cache.invalidate_occupancy((STATION_ID, DAY_START, next_day_start + SLOT_STEP))
+        for day in (DAY, DAY + timedelta(days=1)):
+            assert await redis.get(cache.occupancy_key(STATION_ID, day)) is None
+            assert await redis.get(cache.generation_key(STATION_ID, day)) == "1"
+
+    asyncio.run(run())
@@ -0,0 +1,88 @@
+from datetime import date, datetime, timedelta
+
+from src.reservations.slots import (FULL_MASK, SLOT_STEP, SLOTS_PER_DAY, day_bounds, free_mask, iter_days,
+                                    mask_to_slots, next_free_slot, occupancy_mask)
+
+"""
+Slot mask arithmetic, written against the configured club hours and slot length
+"""
+
+DAY = date(2030, 6, 15)
+DAY_START, DAY_END = day_bounds(DAY)
+
+
+def slot_start(index: int) -> datetime:
+    return DAY_START + index * SLOT_STEP
+
+
+def test_day_bounds_span_all_slots():
+    assert DAY_START.date() == DAY
+    assert DAY_END - DAY_START == SLOTS_PER_DAY * SLOT_STEP
+
+
+def test_occupancy_mask_of_whole_slots():
+    assert occupancy_mask(slot_start(0), slot_start(1), DAY_START) == 0b1
+    assert occupancy_mask(slot_start(1), slot_start(3), DAY_START) == 0b110
+    assert occupancy_mask(DAY_START, DAY_END, DAY_START) == FULL_MASK
+
+
+def test_occupancy_mask_rounds_partial_slots_outwards():
+    half_slot = SLOT_STEP / 2
+    assert occupancy_mask(slot_start(0) + half_slot, slot_start(1) + half_slot, DAY_START) == 0b11
+    assert occupancy_mask(slot_start(2) + half_slot, slot_start(3), DAY_START) == 0b100
+    assert occupancy_mask(slot_start(2), slot_start(2) + timedelta(minutes=1), DAY_START) == 0b100
+
+
+def test_occupancy_mask_of_empty_and_outside_ranges():
+    assert occupancy_mask(slot_start(1), slot_start(1), DAY_START) == 0
+    assert occupancy_mask(DAY_START - timedelta(hours=3), DAY_START, DAY_START) == 0
+    assert occupancy_mask(DAY_END, DAY_END + timedelta(hours=3), DAY_START) == 0
+
+
+def test_occupancy_mask_clamps_to_working_hours():
+    assert occupancy_mask(DAY_START - timedelta(hours=1), slot_start(1), DAY_START) == 0b1
+    last_bit = 1 << (SLOTS_PER_DAY - 1)
+    assert occupancy_mask(DAY_END - SLOT_STEP, DAY_END + timedelta(hours=1), DAY_START) == last_bit
+
+
+def test_occupancy_mask_across_midnight():
+    next_day_start, _ = day_bounds(DAY + timedelta(days=1))
+    start_time = DAY_END - SLOT_STEP
+    end_time = next_day_start + SLOT_STEP + timedelta(minutes=1)
+    assert start_time.date() == DAY and end_time.date() == DAY + timedelta(days=1)
+    assert occupancy_mask(start_time, end_time, DAY_START) == 1 << (SLOTS_PER_DAY - 1)
+    assert occupancy_mask(start_time, end_time, next_day_start) == 0b11
+    previous_day_start, _ = day_bounds(DAY - timedelta(days=1))
+    assert occupancy_mask(start_time, end_time, previous_day_start) == 0
+
+
+def test_free_mask():
+    assert free_mask(0) == FULL_MASK
+    assert free_mask(FULL_MASK) == 0
+    assert free_mask(0b101) == FULL_MASK ^ 0b101
+
+
+def test_mask_to_slots():
+    assert mask_to_slots(0, DAY_START) == []
+    assert mask_to_slots(0b101, DAY_START) == [slot_start(0).strftime("%H:%M"), slot_start(2).strftime("%H:%M")]
+    assert len(mask_to_slots(FULL_MASK, DAY_START)) == SLOTS_PER_DAY
+
+
+def test_next_free_slot():
+    assert next_free_slot(0, DAY_START, DAY_START - timedelta(hours=1)) == slot_start(0).strftime("%H:%M")
+    assert next_free_slot(0b11, DAY_START, DAY_START) == slot_start(2).strftime("%H:%M")
+    assert next_free_slot(0b1000, DAY_START, slot_start(3)) == slot_start(4).strftime("%H:%M")
+
+
+def test_next_free_slot_skips_the_started_slot():
+    assert next_free_slot(0, DAY_START, slot_start(1) + timedelta(minutes=1)) == slot_start(2).strftime("%H:%M")
+
+
+def test_next_free_slot_of_a_full_day():
+    assert next_free_slot(FULL_MASK, DAY_START, DAY_START) is None
+    assert next_free_slot(0, DAY_START, DAY_END) is None
+
+
+def test_iter_days():
+    assert iter_days(DAY, DAY) == [DAY]
+    assert iter_days(date(2030, 12, 31), date(2031, 1, 2)) == [date(2030, 12, 31), date(2031, 1, 1), date(2031, 1, 2)]